@@ -78,8 +78,12 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        # Per-migration transactions let migrations use autocommit_block()
+        # (CREATE INDEX CONCURRENTLY, batched backfills) without affecting others.
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=True,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,41 @@
+"""jira_subscriptions unique (user_id, project_key, issue_key)
+
+Revision ID: 20261016_0001
+Revises: 20260204_0001
+Create Date: 2026-10-16
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20261016_0001"
+down_revision: str | Sequence[str] | None = "20260204_0001"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Drop duplicates left by the old check-then-insert path, keeping the oldest row.
+    op.execute(
+        """
+        DELETE FROM jira_subscriptions s
+        USING jira_subscriptions d
+        WHERE s.user_id = d.user_id
+          AND s.project_key = d.project_key
+          AND COALESCE(s.issue_key, '') = COALESCE(d.issue_key, '')
+          AND s.id > d.id
+        """
+    )
+    # issue_key is NULL for project-wide subscriptions; COALESCE makes those unique too.
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_jira_sub_user_proj_issue "
+        "ON jira_subscriptions (user_id, project_key, COALESCE(issue_key, ''))"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS uq_jira_sub_user_proj_issue")
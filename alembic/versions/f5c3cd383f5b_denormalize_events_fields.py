@@ -17,6 +17,52 @@ down_revision: Union[str, Sequence[str], None] = '2eb47063a061'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
+BACKFILL_BATCH_SIZE = 10_000
+
+
+def _backfill_denormalized_columns() -> None:
+    # `events` is a shared inbox and can be large: backfill in id-ranged batches,
+    # each committed separately, so locks and transaction size stay bounded.
+    conn = op.get_bind()
+    max_id = conn.execute(sa.text("SELECT max(id) FROM events")).scalar()
+    if max_id is None:
+        return
+
+    with op.get_context().autocommit_block():
+        # Throw-away partial index over not-yet-backfilled rows: batches (and re-runs
+        # after an interrupted upgrade) skip already filled rows without a seqscan.
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS tmp_events_backfill_null ON events (id) "
+            "WHERE event_type IS NULL OR tg_id IS NULL OR chat_id IS NULL OR request_kind IS NULL"
+        )
+        last_id = 0
+        while last_id < max_id:
+            op.execute(
+                sa.text(
+                    """
+                    UPDATE events
+                    SET
+                      event_type = payload->>'event_type',
+                      tg_id = (payload #>> '{tg,tg_id}')::bigint,
+                      chat_id = (payload #>> '{tg,chat_id}')::bigint,
+                      request_kind = COALESCE(
+                        NULLIF(payload #>> '{request,kind}', ''),
+                        NULLIF(payload #>> '{command,name}', '')
+                      )
+                    WHERE
+                      id > :last_id AND id <= :upper_id
+                      AND (
+                        event_type IS NULL
+                        OR tg_id IS NULL
+                        OR chat_id IS NULL
+                        OR request_kind IS NULL
+                      )
+                    """
+                ).bindparams(last_id=last_id, upper_id=last_id + BACKFILL_BATCH_SIZE)
+            )
+            last_id += BACKFILL_BATCH_SIZE
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS tmp_events_backfill_null")
+
 
 def upgrade() -> None:
     """Upgrade schema."""
@@ -36,37 +82,36 @@ def upgrade() -> None:
         """
     )
 
+    # Plain columns rather than GENERATED ... STORED: writers (CoreTasksRepository.insert_event
+    # and core-orchestrator) set them explicitly, and a generated column would also force a
+    # full rewrite of `events` under ACCESS EXCLUSIVE. The backfill mirrors insert_event.
     op.add_column("events", sa.Column("event_type", sa.String(length=64), nullable=True))
     op.add_column("events", sa.Column("tg_id", sa.BigInteger(), nullable=True))
     op.add_column("events", sa.Column("chat_id", sa.BigInteger(), nullable=True))
     op.add_column("events", sa.Column("request_kind", sa.String(length=32), nullable=True))
 
-    op.execute(
-        """
-        UPDATE events
-        SET
-          event_type = payload->>'event_type',
-          tg_id = (payload #>> '{tg,tg_id}')::bigint,
-          chat_id = (payload #>> '{tg,chat_id}')::bigint,
-          request_kind = payload #>> '{request,kind}'
-        WHERE
-          event_type IS NULL
-          OR tg_id IS NULL
-          OR chat_id IS NULL
-          OR request_kind IS NULL
-        """
-    )
+    _backfill_denormalized_columns()
 
-    op.create_index("ix_events_event_type_created_at", "events", ["event_type", "created_at"])
-    op.create_index("ix_events_tg_id_created_at", "events", ["tg_id", "created_at"])
-    op.create_index("ix_events_chat_id_created_at", "events", ["chat_id", "created_at"])
+    # CONCURRENTLY cannot run inside a transaction; it keeps `events` writable while building.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_events_event_type_created_at "
+            "ON events (event_type, created_at)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_events_tg_id_created_at ON events (tg_id, created_at)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_events_chat_id_created_at ON events (chat_id, created_at)"
+        )
 
 
 def downgrade() -> None:
     """Downgrade schema."""
-    op.drop_index("ix_events_chat_id_created_at", table_name="events")
-    op.drop_index("ix_events_tg_id_created_at", table_name="events")
-    op.drop_index("ix_events_event_type_created_at", table_name="events")
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_events_chat_id_created_at")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_events_tg_id_created_at")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_events_event_type_created_at")
 
     op.drop_column("events", "request_kind")
     op.drop_column("events", "chat_id")
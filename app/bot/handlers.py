@@ -1,4 +1,8 @@
 import asyncio
+import contextlib
+import functools
+import re
+import time
 from datetime import date, datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 
@@ -7,6 +11,7 @@ UTC = timezone.utc
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
 from aiogram.types import BufferedInputFile, KeyboardButton, Message, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -17,14 +22,12 @@ from app.bot.states import (
     EditReminderStates,
     NewReminderStates,
 )
+from app.bot.users import get_or_create_user
 from app.config.settings import settings
-from app.repositories.reminder_repository import ReminderRepository
 from app.repositories.core_tasks_repository import CoreTasksRepository
-from app.repositories.user_repository import UserRepository
 from app.services.reminder_service import ReminderService
-from app.services.user_service import UserService
 from app.db import AsyncSessionLocal
-from app.utils.datetime import build_user_datetime, format_user_datetime, parse_user_date
+from app.utils.datetime import format_user_datetime, parse_user_date, parse_user_time
 
 
 router = Router()
@@ -39,6 +42,11 @@ TYPE_OPTIONS = {
     "Ежемесячно": "monthly",
     "Cron": "cron",
 }
+VALID_TYPES = frozenset(TYPE_OPTIONS.values())
+
+CORE_KINDS = frozenset({"question", "task"})
+CORE_RUN_NOW_ANSWERS = frozenset({"запустить сразу", "сразу", "run"})
+CORE_RUN_WAIT_ANSWERS = frozenset({"ждать /run", "ждать", "wait"})
 
 DAY_OPTIONS = {
     "Сегодня": 0,
@@ -58,31 +66,177 @@ FIXED_TIME_OPTIONS = {
     "18:00": (18, 0),
 }
 
+# Reply keyboards are static; build them once and reuse for every message.
+REMOVE_KEYBOARD = ReplyKeyboardRemove()
+
+TYPE_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="Разово"), KeyboardButton(text="Ежедневно")],
+        [KeyboardButton(text="Еженедельно"),
+         KeyboardButton(text="Ежемесячно")],
+        [KeyboardButton(text="Cron")],
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True,
+)
+
+DAY_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="Сегодня"),
+         KeyboardButton(text="Завтра")],
+        [KeyboardButton(text="Другая дата")],
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True,
+)
+
+TIME_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="09:00"), KeyboardButton(
+            text="12:00"), KeyboardButton(text="18:00")],
+        [KeyboardButton(text="Через 1 минуту"),
+         KeyboardButton(text="Через 10 минут")],
+        [KeyboardButton(text="Через 1 час"),
+         KeyboardButton(text="Ввести время")],
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True,
+)
+
+CORE_KIND_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="Вопрос"), KeyboardButton(text="Задача")],
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True,
+)
+
+CORE_RUN_MODE_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="Запустить сразу")],
+        [KeyboardButton(text="Ждать /run")],
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True,
+)
+
+CRON_HELP_TEXT = (
+    "Cron: минуты → часы → день_месяца → месяц → день_недели.\n"
+    "Примеры (ежедневные):\n"
+    "• Каждый день в 09:00 — `0 9 * * *`\n"
+    "• По будням в 18:30 — `30 18 * * 1-5`\n"
+    "• Со вторника по четверг в 10:00 — `0 10 * * 2-4`\n"
+    "• Каждые 2 часа — `0 */2 * * *`\n"
+    "Примеры (ежемесячные):\n"
+    "• 1‑го числа в 09:00 — `0 9 1 * *`\n"
+    "• 15‑го числа в 09:00 — `0 9 15 * *`"
+)
+
+START_TEXT = (
+    "Бот напоминаний готов.\n"
+    "Команды:\n"
+    "/list — все уведомления\n"
+    "/list7 — уведомления на 7 дней\n"
+    "/list14 — уведомления на 14 дней\n"
+    "/list30 — уведомления на 30 дней\n"
+    "/new — создать уведомление\n"
+    "/edit — редактировать уведомление\n"
+    "/disable — отключить уведомление\n"
+    "/delete — удалить уведомление\n"
+    "/core — вопрос/задача для оркестратора\n"
+    "/fridge — что в холодильнике\n"
+    "/fridge_add — добавить продукты/еду\n"
+    "/fridge_remove — убрать продукты/еду\n"
+    "/fridge_update — добавить/убрать по тексту\n"
+    "/meal — рекомендация (завтрак/обед/ужин/день/неделя)\n"
+    "/task <id> — статус задачи\n"
+    "/tasks — список твоих задач\n"
+    "/run <task_id> — запустить задачу/вопрос\n"
+    "/hold <task_id> — приостановить (пока логируем)\n"
+    "/ask <task_id> <text> — ответить на уточняющий вопрос LLM\n"
+    "/cancel — отменить создание"
+)
+
+
+@functools.lru_cache(maxsize=32)
+def _tz(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
+
+
+def _today(tz_name: str) -> date:
+    # "Сегодня"/"Завтра" are relative to the reminders' timezone, not the host's.
+    return datetime.now(_tz(tz_name)).date()
+
+
+_MONTHS_GENITIVE = (
+    "января",
+    "февраля",
+    "марта",
+    "апреля",
+    "мая",
+    "июня",
+    "июля",
+    "августа",
+    "сентября",
+    "октября",
+    "ноября",
+    "декабря",
+)
+
+# Russian plural form depends only on the last two digits; index by value % 100.
+_PLURAL_DAYS = tuple(
+    "день" if n % 10 == 1 and n != 11
+    else "дня" if n % 10 in (2, 3, 4) and n not in (12, 13, 14)
+    else "дней"
+    for n in range(100)
+)
+
 
 def _plural_days(value: int) -> str:
-    if value % 10 == 1 and value % 100 != 11:
-        return "день"
-    if value % 10 in {2, 3, 4} and value % 100 not in {12, 13, 14}:
-        return "дня"
-    return "дней"
+    return _PLURAL_DAYS[value % 100]
 
 
 def _format_month_day(value: date) -> str:
-    months = [
-        "января",
-        "февраля",
-        "марта",
-        "апреля",
-        "мая",
-        "июня",
-        "июля",
-        "августа",
-        "сентября",
-        "октября",
-        "ноября",
-        "декабря",
-    ]
-    return f"{value.day:02d} {months[value.month - 1]}"
+    return f"{value.day:02d} {_MONTHS_GENITIVE[value.month - 1]}"
+
+
+def _state_target_date(data: dict) -> date | None:
+    # Date steps store the parsed date as an ordinal, so time steps do not re-parse it.
+    ordinal = data.get("parsed_date_ord")
+    if isinstance(ordinal, int):
+        return date.fromordinal(ordinal)
+    date_value = data.get("date_value")
+    return parse_user_date(date_value) if date_value else None
+
+
+def _clean(text: str | None) -> str:
+    return text.strip() if text else ""
+
+
+# ASCII digits only and at most 18 of them, so every accepted id fits a Postgres bigint.
+_ID_RE = re.compile(r"\A\d{1,18}\Z", re.ASCII)
+
+
+def _parse_id(raw: str) -> int | None:
+    raw = raw.strip()
+    if not _ID_RE.match(raw):
+        return None
+    value = int(raw)
+    return value if value > 0 else None
+
+
+def _parse_id_command(text: str | None, *, want_text: bool = False) -> tuple[int, str | None] | None:
+    """Parse `/cmd <id>` (or `/cmd <id> <text>` with want_text); None on bad input."""
+    args = (text or "").split(maxsplit=2 if want_text else 1)
+    if len(args) < 2:
+        return None
+    task_id = _parse_id(args[1])
+    if task_id is None:
+        return None
+    if not want_text:
+        return task_id, None
+    rest = args[2].strip() if len(args) > 2 else ""
+    return (task_id, rest) if rest else None
 
 
 async def _answer_text_or_file(message: Message, *, text: str, filename: str) -> None:
@@ -97,24 +251,16 @@ def _format_reminders(reminders) -> str:
     if not reminders:
         return "Пока нет уведомлений."
 
-    tz_name = settings.default_timezone
-    tz = ZoneInfo(tz_name)
+    tz = _tz(settings.default_timezone)
     today = datetime.now(tz).date()
 
-    def reminder_dt(reminder):
-        return reminder.next_run_at or reminder.run_at
-
-    def sort_key(reminder):
-        dt = reminder_dt(reminder)
-        sort_dt = dt if dt else datetime.max.replace(tzinfo=UTC)
-        status_rank = 0 if reminder.status == "active" else 1
-        return (status_rank, sort_dt)
-
-    sorted_items = sorted(reminders, key=sort_key)
-    blocks: dict[str, list[str]] = {}
+    # Repository returns items already ordered (status, run time), so equal
+    # headers are adjacent: emit a header on change.
+    out: list[str] = []
+    last_header = None
 
-    for reminder in sorted_items:
-        dt = reminder_dt(reminder)
+    for reminder in reminders:
+        dt = reminder.next_run_at or reminder.run_at
         if dt:
             local_dt = dt.astimezone(tz)
             local_date = local_dt.date()
@@ -127,7 +273,7 @@ def _format_reminders(reminders) -> str:
                 header = f"Через {days_diff} {_plural_days(days_diff)}"
             else:
                 header = _format_month_day(local_date)
-            time_part = local_dt.strftime("%H:%M")
+            time_part = f"{local_dt.hour:02d}:{local_dt.minute:02d}"
         else:
             header = "Без даты"
             time_part = "--:--"
@@ -135,13 +281,14 @@ def _format_reminders(reminders) -> str:
         if reminder.status != "active":
             header = f"{header} • выполнено"
 
-        line = f"#{reminder.id} • {time_part} • {reminder.title} • {reminder.reminder_type}"
-        blocks.setdefault(header, []).append(line)
+        if header != last_header:
+            if out:
+                out.append("")
+            out.append(f"{header}:")
+            last_header = header
+        out.append(f"#{reminder.id} • {time_part} • {reminder.title} • {reminder.reminder_type}")
 
-    parts = []
-    for header, lines in blocks.items():
-        parts.append(f"{header}:\n" + "\n".join(lines))
-    return "\n\n".join(parts)
+    return "\n".join(out)
 
 
 def _parse_fridge_item_line(line: str) -> dict | None:
@@ -265,7 +412,7 @@ async def _insert_fridge_request(
     text: str,
     fridge_action: dict,
 ) -> None:
-    await _get_or_create_user(session, message)
+    await get_or_create_user(session, message)
     repo = CoreTasksRepository(session)
     payload = {
         "event_type": "user_request",
@@ -288,99 +435,70 @@ async def _insert_fridge_request(
     await repo.insert_event(source="telegram", external_id=external_id, payload=payload)
 
 
-def _time_keyboard() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="09:00"), KeyboardButton(
-                text="12:00"), KeyboardButton(text="18:00")],
-            [KeyboardButton(text="Через 1 минуту"),
-             KeyboardButton(text="Через 10 минут")],
-            [KeyboardButton(text="Через 1 час"),
-             KeyboardButton(text="Ввести время")],
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-
-
-async def _get_or_create_user(session: AsyncSession, message: Message):
-    repo = UserRepository(session)
-    service = UserService(repo)
-    return await service.get_or_create(
-        tg_id=message.from_user.id,
-        username=message.from_user.username,
-        first_name=message.from_user.first_name,
-    )
+async def _get_state_user_id(session: AsyncSession, message: Message, data: dict) -> int:
+    # Earlier FSM steps that already resolved the user keep its id in state data.
+    user_id = data.get("user_id")
+    if isinstance(user_id, int):
+        return user_id
+    return (await get_or_create_user(session, message)).id
 
 
 @router.message(Command("start"))
 async def start_handler(message: Message, session: AsyncSession):
-    await _get_or_create_user(session, message)
-    await message.answer(
-        "Бот напоминаний готов.\n"
-        "Команды:\n"
-        "/list — все уведомления\n"
-        "/list7 — уведомления на 7 дней\n"
-        "/list14 — уведомления на 14 дней\n"
-        "/list30 — уведомления на 30 дней\n"
-        "/new — создать уведомление\n"
-        "/edit — редактировать уведомление\n"
-        "/disable — отключить уведомление\n"
-        "/delete — удалить уведомление\n"
-        "/core — вопрос/задача для оркестратора\n"
-        "/fridge — что в холодильнике\n"
-        "/fridge_add — добавить продукты/еду\n"
-        "/fridge_remove — убрать продукты/еду\n"
-        "/fridge_update — добавить/убрать по тексту\n"
-        "/meal — рекомендация (завтрак/обед/ужин/день/неделя)\n"
-        "/task <id> — статус задачи\n"
-        "/tasks — список твоих задач\n"
-        "/run <task_id> — запустить задачу/вопрос\n"
-        "/hold <task_id> — приостановить (пока логируем)\n"
-        "/ask <task_id> <text> — ответить на уточняющий вопрос LLM\n"
-        "/cancel — отменить создание"
-    )
+    await get_or_create_user(session, message)
+    await message.answer(START_TEXT)
 
 
 @router.message(Command("list"))
-async def list_handler(message: Message, session: AsyncSession):
-    user = await _get_or_create_user(session, message)
-    reminders = await ReminderService(ReminderRepository(session)).list_all(user.id)
+async def list_handler(message: Message, session: AsyncSession, reminder_service: ReminderService):
+    user = await get_or_create_user(session, message)
+    reminders = await reminder_service.list_all(user.id)
     await message.answer(_format_reminders(reminders))
 
 
 @router.message(Command("list7"))
-async def list7_handler(message: Message, session: AsyncSession):
-    user = await _get_or_create_user(session, message)
-    reminders = await ReminderService(ReminderRepository(session)).list_next_days(user.id, 7)
+async def list7_handler(message: Message, session: AsyncSession, reminder_service: ReminderService):
+    user = await get_or_create_user(session, message)
+    reminders = await reminder_service.list_next_days(user.id, 7)
     await message.answer(_format_reminders(reminders))
 
 
 @router.message(Command("list14"))
-async def list14_handler(message: Message, session: AsyncSession):
-    user = await _get_or_create_user(session, message)
-    reminders = await ReminderService(ReminderRepository(session)).list_next_days(user.id, 14)
+async def list14_handler(
+    message: Message,
+    session: AsyncSession,
+    reminder_service: ReminderService,
+):
+    user = await get_or_create_user(session, message)
+    reminders = await reminder_service.list_next_days(user.id, 14)
     await message.answer(_format_reminders(reminders))
 
 
 @router.message(Command("list30"))
-async def list30_handler(message: Message, session: AsyncSession):
-    user = await _get_or_create_user(session, message)
-    reminders = await ReminderService(ReminderRepository(session)).list_next_days(user.id, 30)
+async def list30_handler(
+    message: Message,
+    session: AsyncSession,
+    reminder_service: ReminderService,
+):
+    user = await get_or_create_user(session, message)
+    reminders = await reminder_service.list_next_days(user.id, 30)
     await message.answer(_format_reminders(reminders))
 
 
 @router.message(Command("cancel"))
 async def cancel_handler(message: Message, state: FSMContext):
     await state.clear()
-    await message.answer("Создание уведомления отменено.", reply_markup=ReplyKeyboardRemove())
+    await message.answer("Создание уведомления отменено.", reply_markup=REMOVE_KEYBOARD)
 
 
 @router.message(Command("tasks"))
-async def tasks_list_handler(message: Message, session: AsyncSession):
-    await _get_or_create_user(session, message)
-    repo = CoreTasksRepository(session)
-    tasks = await repo.list_tasks_for_tg(tg_id=message.from_user.id, limit=20)
+async def tasks_list_handler(
+    message: Message,
+    session: AsyncSession,
+    core_tasks_repo: CoreTasksRepository,
+):
+    await get_or_create_user(session, message)
+    tasks = await core_tasks_repo.list_tasks_for_tg(tg_id=message.from_user.id, limit=20)
     if not tasks:
         await message.answer("Пока нет задач. Создай через /core")
         return
@@ -401,15 +519,18 @@ def _format_age(delta_seconds: float) -> str:
 
 
 @router.message(Command("needs_review"))
-async def needs_review_handler(message: Message, session: AsyncSession):
-    await _get_or_create_user(session, message)
-    repo = CoreTasksRepository(session)
-    tasks = await repo.list_needs_review_tasks_for_tg(tg_id=message.from_user.id, limit=50)
+async def needs_review_handler(
+    message: Message,
+    session: AsyncSession,
+    core_tasks_repo: CoreTasksRepository,
+):
+    await get_or_create_user(session, message)
+    tasks = await core_tasks_repo.list_needs_review_tasks_for_tg(tg_id=message.from_user.id, limit=50)
     if not tasks:
         await message.answer("NEEDS_REVIEW задач нет.")
         return
 
-    now = datetime.now(UTC)
+    now_ts = time.time()
     lines = ["NEEDS_REVIEW задачи:"]
     for t in tasks:
         task_id = t.get("id")
@@ -420,7 +541,7 @@ async def needs_review_handler(message: Message, session: AsyncSession):
             dt = needs_review_at
             if dt.tzinfo is None:
                 dt = dt.replace(tzinfo=UTC)
-            age = _format_age((now - dt).total_seconds())
+            age = _format_age(now_ts - dt.timestamp())
         age_text = age or "unknown"
         title_text = title.splitlines()[0].strip() if title else ""
         if len(title_text) > 80:
@@ -435,19 +556,12 @@ async def needs_review_handler(message: Message, session: AsyncSession):
 async def core_handler(message: Message, state: FSMContext):
     await state.clear()
     await state.set_state(CoreRequestStates.kind)
-    kb = ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="Вопрос"), KeyboardButton(text="Задача")],
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-    await message.answer("Что отправляем в оркестратор?", reply_markup=kb)
+    await message.answer("Что отправляем в оркестратор?", reply_markup=CORE_KIND_KEYBOARD)
 
 
 @router.message(CoreRequestStates.kind)
 async def core_kind_handler(message: Message, state: FSMContext):
-    kind_text = (message.text or "").strip().lower()
+    kind_text = _clean(message.text).lower()
     if kind_text == "вопрос":
         kind = "question"
     elif kind_text == "задача":
@@ -458,15 +572,15 @@ async def core_kind_handler(message: Message, state: FSMContext):
 
     await state.update_data(kind=kind)
     await state.set_state(CoreRequestStates.text)
-    await message.answer("Отправь текст.", reply_markup=ReplyKeyboardRemove())
+    await message.answer("Отправь текст.", reply_markup=REMOVE_KEYBOARD)
 
 
 @router.message(CoreRequestStates.text)
 async def core_text_handler(message: Message, state: FSMContext, session: AsyncSession):
     data = await state.get_data()
     kind = data.get("kind")
-    text = (message.text or "").strip()
-    if kind not in {"question", "task"}:
+    text = _clean(message.text)
+    if kind not in CORE_KINDS:
         await state.clear()
         await message.answer("Ошибка: неизвестный тип запроса. Повтори /core")
         return
@@ -476,15 +590,43 @@ async def core_text_handler(message: Message, state: FSMContext, session: AsyncS
 
     await state.update_data(text=text)
     await state.set_state(CoreRequestStates.run_mode)
-    kb = ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="Запустить сразу")],
-            [KeyboardButton(text="Ждать /run")],
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-    await message.answer("Как поступаем?", reply_markup=kb)
+    await message.answer("Как поступаем?", reply_markup=CORE_RUN_MODE_KEYBOARD)
+
+
+async def _await_task_id(*, event_id: int, timeout_s: float) -> int | None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max(timeout_s, 1.0)
+    backoff_s = 0.5
+    while loop.time() < deadline:
+        # Short-lived session per attempt: no pooled connection is held while sleeping.
+        async with AsyncSessionLocal() as bg_session:
+            task_id = await CoreTasksRepository(bg_session).get_task_id_by_event_id(event_id=event_id)
+        if task_id is not None:
+            return task_id
+        await asyncio.sleep(backoff_s)
+        backoff_s = min(backoff_s * 1.5, 5.0)
+    return None
+
+
+async def _insert_auto_run(*, chat_id: int, tg_id: int, event_id: int, task_id: int) -> None:
+    payload = {
+        "event_type": "user_command",
+        "tg": {
+            "tg_id": tg_id,
+            "chat_id": chat_id,
+            "message_id": 0,
+        },
+        "command": {
+            "name": "run",
+            "task_id": task_id,
+            "text": None,
+        },
+    }
+    async with AsyncSessionLocal() as bg_session:
+        await CoreTasksRepository(bg_session).insert_event(
+            source="telegram", external_id=f"auto-run:{event_id}", payload=payload
+        )
+        await bg_session.commit()
 
 
 async def _poll_task_id_and_notify(
@@ -496,21 +638,9 @@ async def _poll_task_id_and_notify(
     auto_run: bool,
     timeout_s: float = 120.0,
 ) -> None:
+    # Runs as a detached task: report any failure to the chat instead of losing it.
     try:
-        loop = asyncio.get_running_loop()
-        deadline = loop.time() + max(timeout_s, 1.0)
-        backoff_s = 0.5
-        task_id: int | None = None
-
-        while loop.time() < deadline:
-            async with AsyncSessionLocal() as bg_session:
-                repo = CoreTasksRepository(bg_session)
-                task_id = await repo.get_task_id_by_event_id(event_id=event_id)
-            if task_id is not None:
-                break
-            await asyncio.sleep(backoff_s)
-            backoff_s = min(backoff_s * 1.5, 5.0)
-
+        task_id = await _await_task_id(event_id=event_id, timeout_s=timeout_s)
         if task_id is None:
             await bot.send_message(
                 chat_id,
@@ -528,38 +658,24 @@ async def _poll_task_id_and_notify(
         if not auto_run:
             return
 
-        async with AsyncSessionLocal() as bg_session:
-            repo = CoreTasksRepository(bg_session)
-            payload = {
-                "event_type": "user_command",
-                "tg": {
-                    "tg_id": tg_id,
-                    "chat_id": chat_id,
-                    "message_id": 0,
-                },
-                "command": {
-                    "name": "run",
-                    "task_id": task_id,
-                    "text": None,
-                },
-            }
-            await repo.insert_event(source="telegram", external_id=f"auto-run:{event_id}", payload=payload)
-            await bg_session.commit()
-
+        await _insert_auto_run(chat_id=chat_id, tg_id=tg_id, event_id=event_id, task_id=task_id)
         await bot.send_message(chat_id, f"Ок. Отправил run для task #{task_id}.")
     except Exception as e:
-        try:
+        with contextlib.suppress(Exception):
             await bot.send_message(chat_id, f"Ошибка при ожидании task_id: {e}")
-        except Exception:
-            pass
 
 
 @router.message(CoreRequestStates.run_mode)
-async def core_run_mode_handler(message: Message, state: FSMContext, session: AsyncSession):
-    mode_text = (message.text or "").strip().lower()
-    if mode_text in {"запустить сразу", "сразу", "run"}:
+async def core_run_mode_handler(
+    message: Message,
+    state: FSMContext,
+    session: AsyncSession,
+    core_tasks_repo: CoreTasksRepository,
+):
+    mode_text = _clean(message.text).lower()
+    if mode_text in CORE_RUN_NOW_ANSWERS:
         auto_run = True
-    elif mode_text in {"ждать /run", "ждать", "wait"}:
+    elif mode_text in CORE_RUN_WAIT_ANSWERS:
         auto_run = False
     else:
         await message.answer("Выбери: Запустить сразу или Ждать /run")
@@ -568,13 +684,13 @@ async def core_run_mode_handler(message: Message, state: FSMContext, session: As
     data = await state.get_data()
     kind = data.get("kind")
     text = data.get("text")
-    if kind not in {"question", "task"} or not isinstance(text, str) or not text.strip():
+    text = text.strip() if isinstance(text, str) else ""
+    if kind not in CORE_KINDS or not text:
         await state.clear()
-        await message.answer("Ошибка: данные запроса потерялись. Повтори /core", reply_markup=ReplyKeyboardRemove())
+        await message.answer("Ошибка: данные запроса потерялись. Повтори /core", reply_markup=REMOVE_KEYBOARD)
         return
 
-    await _get_or_create_user(session, message)
-    repo = CoreTasksRepository(session)
+    await get_or_create_user(session, message)
     payload = {
         "event_type": "user_request",
         "tg": {
@@ -584,18 +700,18 @@ async def core_run_mode_handler(message: Message, state: FSMContext, session: As
         },
         "request": {
             "kind": kind,
-            "text": text.strip(),
+            "text": text,
             "project_id": None,
             "attachments": [],
         },
     }
     external_id = f"{message.chat.id}:{message.message_id}"
-    event_id = await repo.insert_event(source="telegram", external_id=external_id, payload=payload)
+    event_id = await core_tasks_repo.insert_event(source="telegram", external_id=external_id, payload=payload)
     await session.commit()
     await state.clear()
     await message.answer(
         "Принято. Создал событие в core. Дальше жди task в статусе WAITING_APPROVAL.",
-        reply_markup=ReplyKeyboardRemove(),
+        reply_markup=REMOVE_KEYBOARD,
     )
 
     asyncio.create_task(
@@ -612,7 +728,7 @@ async def core_run_mode_handler(message: Message, state: FSMContext, session: As
 async def _insert_core_command(
     session: AsyncSession, message: Message, *, name: str, task_id: int, text: str | None
 ) -> None:
-    await _get_or_create_user(session, message)
+    await get_or_create_user(session, message)
     repo = CoreTasksRepository(session)
     payload = {
         "event_type": "user_command",
@@ -633,11 +749,11 @@ async def _insert_core_command(
 
 @router.message(Command("run"))
 async def run_task_handler(message: Message, session: AsyncSession):
-    args = (message.text or "").split(maxsplit=1)
-    if len(args) < 2 or not args[1].strip().isdigit():
+    parsed = _parse_id_command(message.text)
+    if parsed is None:
         await message.answer("Использование: /run <task_id>")
         return
-    task_id = int(args[1].strip())
+    task_id, _ = parsed
     await _insert_core_command(session, message, name="run", task_id=task_id, text=None)
     await session.commit()
     await message.answer(f"Ок. Отправил run для task #{task_id}.")
@@ -645,11 +761,11 @@ async def run_task_handler(message: Message, session: AsyncSession):
 
 @router.message(Command("hold"))
 async def hold_task_handler(message: Message, session: AsyncSession):
-    args = (message.text or "").split(maxsplit=1)
-    if len(args) < 2 or not args[1].strip().isdigit():
+    parsed = _parse_id_command(message.text)
+    if parsed is None:
         await message.answer("Использование: /hold <task_id>")
         return
-    task_id = int(args[1].strip())
+    task_id, _ = parsed
     await _insert_core_command(session, message, name="hold", task_id=task_id, text=None)
     await session.commit()
     await message.answer(f"Ок. Отправил hold для task #{task_id}.")
@@ -657,12 +773,11 @@ async def hold_task_handler(message: Message, session: AsyncSession):
 
 @router.message(Command("ask"))
 async def ask_task_handler(message: Message, session: AsyncSession):
-    args = (message.text or "").split(maxsplit=2)
-    if len(args) < 3 or not args[1].strip().isdigit() or not args[2].strip():
+    parsed = _parse_id_command(message.text, want_text=True)
+    if parsed is None:
         await message.answer("Использование: /ask <task_id> <text>")
         return
-    task_id = int(args[1].strip())
-    text = args[2].strip()
+    task_id, text = parsed
     await _insert_core_command(session, message, name="ask", task_id=task_id, text=text)
     await session.commit()
     await message.answer(f"Ок. Отправил ask для task #{task_id}.")
@@ -670,7 +785,7 @@ async def ask_task_handler(message: Message, session: AsyncSession):
 
 @router.message(Command("fridge"))
 async def fridge_list_handler(message: Message, session: AsyncSession):
-    txt = (message.text or "").strip()
+    txt = _clean(message.text)
     include_expired = "--expired" in txt or "expired" in txt
     await _insert_fridge_request(
         session,
@@ -816,7 +931,7 @@ async def meal_recommend_handler(message: Message, session: AsyncSession):
         session,
         message,
         kind="question",
-        text=(message.text or "").strip() or "meal recommendation",
+        text=_clean(message.text) or "meal recommendation",
         fridge_action={"type": "recommend", "meal": meal, "target_kcal": target_kcal, "preferences": prefs},
     )
     await session.commit()
@@ -824,20 +939,18 @@ async def meal_recommend_handler(message: Message, session: AsyncSession):
 
 
 @router.message(Command("task"))
-async def task_status_handler(message: Message, session: AsyncSession):
-    args = (message.text or "").split(maxsplit=1)
-    if len(args) < 2 or not args[1].strip().isdigit():
+async def task_status_handler(message: Message, core_tasks_repo: CoreTasksRepository):
+    parsed = _parse_id_command(message.text)
+    if parsed is None:
         await message.answer("Использование: /task <id>")
         return
-    task_id = int(args[1].strip())
-    repo = CoreTasksRepository(session)
-    task = await repo.get_task(task_id=task_id)
+    task_id, _ = parsed
+    task = await core_tasks_repo.get_task(task_id=task_id)
     if not task:
         await message.answer("Задача не найдена.")
         return
-    llm_result = await repo.get_latest_llm_result(task_id=task_id)
-    answer = await repo.get_latest_llm_answer(task_id=task_id)
-    codegen_job = await repo.get_latest_codegen_job(task_id=task_id)
+    llm_result, answer = await core_tasks_repo.get_latest_llm_result_and_answer(task_id=task_id)
+    codegen_job = await core_tasks_repo.get_latest_codegen_job(task_id=task_id)
     msg = f"task #{task['id']} • {task['status']}\n{task['title']}"
     if answer:
         msg += f"\n\nОтвет:\n{answer}"
@@ -863,7 +976,7 @@ async def task_status_handler(message: Message, session: AsyncSession):
 async def new_handler(message: Message, state: FSMContext):
     await state.clear()
     await state.set_state(NewReminderStates.title)
-    await message.answer("Название уведомления:", reply_markup=ReplyKeyboardRemove())
+    await message.answer("Название уведомления:", reply_markup=REMOVE_KEYBOARD)
 
 
 @router.message(Command("edit"))
@@ -872,485 +985,392 @@ async def edit_handler(message: Message, state: FSMContext):
     await state.set_state(EditReminderStates.reminder_id)
     await message.answer(
         "Введите номер уведомления для редактирования (например, 12):",
-        reply_markup=ReplyKeyboardRemove(),
+        reply_markup=REMOVE_KEYBOARD,
     )
 
 
 @router.message(Command("disable"))
-async def disable_handler(message: Message, state: FSMContext, session: AsyncSession):
+async def disable_handler(
+    message: Message,
+    state: FSMContext,
+    session: AsyncSession,
+    reminder_service: ReminderService,
+):
     args = (message.text or "").split(maxsplit=1)
     if len(args) < 2:
         await message.answer("Введите ID уведомления для отключения:")
         await state.set_state(DisableReminderStates.reminder_id)
         return
-    if not args[1].strip().isdigit():
+    reminder_id = _parse_id(args[1])
+    if reminder_id is None:
         await message.answer("Использование: /disable <id> или отправь id в следующем сообщении")
         return
-    reminder_id = int(args[1].strip())
-    user = await _get_or_create_user(session, message)
-    service = ReminderService(ReminderRepository(session))
-    reminder = await service.get_by_id_for_user(reminder_id, user.id)
-    if not reminder:
+    user = await get_or_create_user(session, message)
+    if not await reminder_service.mark_done_for_user(reminder_id, user.id):
         await message.answer("Уведомление не найдено или не принадлежит тебе.")
         return
-    await service.mark_done(reminder)
-    await message.answer(f"Уведомление #{reminder.id} отключено (status=done).")
+    await message.answer(f"Уведомление #{reminder_id} отключено (status=done).")
 
 
 @router.message(Command("delete"))
-async def delete_handler(message: Message, state: FSMContext, session: AsyncSession):
+async def delete_handler(
+    message: Message,
+    state: FSMContext,
+    session: AsyncSession,
+    reminder_service: ReminderService,
+):
     args = (message.text or "").split(maxsplit=1)
     if len(args) < 2:
         # Ask for ID in next message
         await message.answer("Введите ID уведомления для удаления:")
         await state.set_state(DeleteReminderStates.reminder_id)
         return
-    if not args[1].strip().isdigit():
+    reminder_id = _parse_id(args[1])
+    if reminder_id is None:
         await message.answer("Использование: /delete <id> или отправь id в следующем сообщении")
         return
-    reminder_id = int(args[1].strip())
-    user = await _get_or_create_user(session, message)
-    service = ReminderService(ReminderRepository(session))
-    reminder = await service.get_by_id_for_user(reminder_id, user.id)
-    if not reminder:
+    user = await get_or_create_user(session, message)
+    if not await reminder_service.delete_for_user(reminder_id, user.id):
         await message.answer("Уведомление не найдено или не принадлежит тебе.")
         return
-    await service.delete(reminder)
     await message.answer(f"Уведомление #{reminder_id} удалено.")
 
 
 @router.message(DeleteReminderStates.reminder_id)
-async def delete_id_handler(message: Message, state: FSMContext, session: AsyncSession):
-    raw = (message.text or "").strip()
-    if not raw.isdigit():
+async def delete_id_handler(
+    message: Message,
+    state: FSMContext,
+    session: AsyncSession,
+    reminder_service: ReminderService,
+):
+    reminder_id = _parse_id(message.text or "")
+    if reminder_id is None:
         await message.answer("Нужен числовой ID уведомления.")
         return
-    reminder_id = int(raw)
-    user = await _get_or_create_user(session, message)
-    service = ReminderService(ReminderRepository(session))
-    reminder = await service.get_by_id_for_user(reminder_id, user.id)
-    if not reminder:
+    user = await get_or_create_user(session, message)
+    if not await reminder_service.delete_for_user(reminder_id, user.id):
         await message.answer("Уведомление не найдено или не принадлежит тебе.")
         return
-    await service.delete(reminder)
     await state.clear()
     await message.answer(f"Уведомление #{reminder_id} удалено.")
 
 
 @router.message(DisableReminderStates.reminder_id)
-async def disable_id_handler(message: Message, state: FSMContext, session: AsyncSession):
-    raw = (message.text or "").strip()
-    if not raw.isdigit():
+async def disable_id_handler(
+    message: Message,
+    state: FSMContext,
+    session: AsyncSession,
+    reminder_service: ReminderService,
+):
+    reminder_id = _parse_id(message.text or "")
+    if reminder_id is None:
         await message.answer("Нужен числовой ID уведомления.")
         return
-    reminder_id = int(raw)
-    user = await _get_or_create_user(session, message)
-    service = ReminderService(ReminderRepository(session))
-    reminder = await service.get_by_id_for_user(reminder_id, user.id)
-    if not reminder:
+    user = await get_or_create_user(session, message)
+    if not await reminder_service.mark_done_for_user(reminder_id, user.id):
         await message.answer("Уведомление не найдено или не принадлежит тебе.")
         return
-    await service.mark_done(reminder)
     await state.clear()
     await message.answer(f"Уведомление #{reminder_id} отключено (status=done).")
 
 
-@router.message(NewReminderStates.title)
-async def new_title_handler(message: Message, state: FSMContext):
-    title = (message.text or "").strip()
-    if not title:
-        await message.answer("Название не может быть пустым.")
-        return
-    await state.update_data(title=title)
-    await state.set_state(NewReminderStates.reminder_type)
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="Разово"), KeyboardButton(text="Ежедневно")],
-            [KeyboardButton(text="Еженедельно"),
-             KeyboardButton(text="Ежемесячно")],
-            [KeyboardButton(text="Cron")],
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-    await message.answer("Тип уведомления:", reply_markup=keyboard)
-
-
 @router.message(EditReminderStates.reminder_id)
-async def edit_id_handler(message: Message, state: FSMContext, session: AsyncSession):
-    raw = (message.text or "").strip()
-    if not raw.isdigit():
+async def edit_id_handler(
+    message: Message,
+    state: FSMContext,
+    session: AsyncSession,
+    reminder_service: ReminderService,
+):
+    reminder_id = _parse_id(message.text or "")
+    if reminder_id is None:
         await message.answer("Нужен числовой ID уведомления.")
         return
-    reminder_id = int(raw)
-    user = await _get_or_create_user(session, message)
-    reminder = await ReminderService(ReminderRepository(session)).get_by_id_for_user(
-        reminder_id, user.id
-    )
+    user = await get_or_create_user(session, message)
+    reminder = await reminder_service.get_by_id_for_user(reminder_id, user.id)
     if not reminder:
         await message.answer("Уведомление не найдено или не принадлежит тебе.")
         return
-    await state.update_data(reminder_id=reminder_id)
+    await state.update_data(reminder_id=reminder_id, user_id=user.id)
     await state.set_state(EditReminderStates.title)
     await message.answer(
         f"Новое название (сейчас: {reminder.title}):",
-        reply_markup=ReplyKeyboardRemove(),
+        reply_markup=REMOVE_KEYBOARD,
     )
 
 
-@router.message(EditReminderStates.title)
-async def edit_title_handler(message: Message, state: FSMContext):
-    title = (message.text or "").strip()
-    if not title:
-        await message.answer("Название не может быть пустым.")
-        return
-    await state.update_data(title=title)
-    await state.set_state(EditReminderStates.reminder_type)
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="Разово"), KeyboardButton(text="Ежедневно")],
-            [KeyboardButton(text="Еженедельно"),
-             KeyboardButton(text="Ежемесячно")],
-            [KeyboardButton(text="Cron")],
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-    await message.answer("Тип уведомления:", reply_markup=keyboard)
-
-
-@router.message(NewReminderStates.reminder_type)
-async def new_type_handler(message: Message, state: FSMContext):
-    raw = (message.text or "").strip()
-    reminder_type = TYPE_OPTIONS.get(raw) or raw.lower()
-    if reminder_type not in {"one_time", "daily", "weekly", "monthly", "cron"}:
-        await message.answer("Неверный тип. Выбери из кнопок.")
-        return
-    await state.update_data(reminder_type=reminder_type)
-    if reminder_type == "cron":
-        await state.set_state(NewReminderStates.cron_expr)
-        await message.answer(
-            "Cron: минуты → часы → день_месяца → месяц → день_недели.\n"
-            "Примеры (ежедневные):\n"
-            "• Каждый день в 09:00 — `0 9 * * *`\n"
-            "• По будням в 18:30 — `30 18 * * 1-5`\n"
-            "• Со вторника по четверг в 10:00 — `0 10 * * 2-4`\n"
-            "• Каждые 2 часа — `0 */2 * * *`\n"
-            "Примеры (ежемесячные):\n"
-            "• 1‑го числа в 09:00 — `0 9 1 * *`\n"
-            "• 15‑го числа в 09:00 — `0 9 15 * *`",
-            reply_markup=ReplyKeyboardRemove(),
-        )
-    else:
-        await state.set_state(NewReminderStates.day_choice)
-        keyboard = ReplyKeyboardMarkup(
-            keyboard=[
-                [KeyboardButton(text="Сегодня"),
-                 KeyboardButton(text="Завтра")],
-                [KeyboardButton(text="Другая дата")],
-            ],
-            resize_keyboard=True,
-            one_time_keyboard=True,
-        )
-        await message.answer("Когда напомнить?", reply_markup=keyboard)
+# The /new and /edit flows share every step; only the FSM states group and the
+# final persistence (create vs update) differ, so each step is built per group.
+ReminderStates = type[NewReminderStates] | type[EditReminderStates]
 
 
-@router.message(EditReminderStates.reminder_type)
-async def edit_type_handler(message: Message, state: FSMContext):
-    raw = (message.text or "").strip()
-    reminder_type = TYPE_OPTIONS.get(raw) or raw.lower()
-    if reminder_type not in {"one_time", "daily", "weekly", "monthly", "cron"}:
-        await message.answer("Неверный тип. Выбери из кнопок.")
-        return
-    await state.update_data(reminder_type=reminder_type)
-    if reminder_type == "cron":
-        await state.set_state(EditReminderStates.cron_expr)
-        await message.answer(
-            "Cron: минуты → часы → день_месяца → месяц → день_недели.\n"
-            "Примеры (ежедневные):\n"
-            "• Каждый день в 09:00 — `0 9 * * *`\n"
-            "• По будням в 18:30 — `30 18 * * 1-5`\n"
-            "• Со вторника по четверг в 10:00 — `0 10 * * 2-4`\n"
-            "• Каждые 2 часа — `0 */2 * * *`\n"
-            "Примеры (ежемесячные):\n"
-            "• 1‑го числа в 09:00 — `0 9 1 * *`\n"
-            "• 15‑го числа в 09:00 — `0 9 15 * *`",
-            reply_markup=ReplyKeyboardRemove(),
-        )
-    else:
-        await state.set_state(EditReminderStates.day_choice)
-        keyboard = ReplyKeyboardMarkup(
-            keyboard=[
-                [KeyboardButton(text="Сегодня"),
-                 KeyboardButton(text="Завтра")],
-                [KeyboardButton(text="Другая дата")],
-            ],
-            resize_keyboard=True,
-            one_time_keyboard=True,
-        )
-        await message.answer("Когда напомнить?", reply_markup=keyboard)
+async def _save_reminder(
+    session: AsyncSession,
+    reminder_service: ReminderService,
+    message: Message,
+    data: dict,
+    states: ReminderStates,
+    *,
+    reminder_type: str,
+    run_at: datetime | None,
+    cron_expr: str | None,
+    tz_name: str,
+):
+    user_id = await _get_state_user_id(session, message, data)
+    fields = {
+        "title": data["title"],
+        "message": data["title"],
+        "reminder_type": reminder_type,
+        "run_at": run_at,
+        "cron_expr": cron_expr,
+        "timezone": tz_name,
+    }
+    if states is EditReminderStates:
+        return await reminder_service.update_for_user(data["reminder_id"], user_id, **fields)
+    return await reminder_service.create(user_id=user_id, **fields)
 
 
-@router.message(NewReminderStates.day_choice)
-async def new_day_choice_handler(message: Message, state: FSMContext):
-    raw = (message.text or "").strip()
-    if raw not in DAY_OPTIONS:
-        await message.answer("Выбери из кнопок.")
-        return
-    offset = DAY_OPTIONS[raw]
-    if offset is None:
-        await state.set_state(NewReminderStates.date_value)
-        await message.answer("Дата (DD-MM-YYYY):", reply_markup=ReplyKeyboardRemove())
+async def _answer_saved(
+    message: Message, state: FSMContext, states: ReminderStates, reminder, tz_name: str, **kwargs
+) -> None:
+    await state.clear()
+    if not reminder:
+        await message.answer("Уведомление не найдено или не принадлежит тебе.")
         return
-    target_date = date.today() + timedelta(days=offset)
-    await state.update_data(
-        date_value=target_date.strftime("%Y-%m-%d"),
-        day_offset=offset,
+    verb = "Обновлено" if states is EditReminderStates else "Создано"
+    await message.answer(
+        f"{verb} уведомление #{reminder.id} на {format_user_datetime(reminder.next_run_at, tz_name)}",
+        **kwargs,
     )
-    await state.set_state(NewReminderStates.time_value)
-    await message.answer("Выбери время или введи вручную:", reply_markup=_time_keyboard())
 
 
-@router.message(EditReminderStates.day_choice)
-async def edit_day_choice_handler(message: Message, state: FSMContext):
-    raw = (message.text or "").strip()
-    if raw not in DAY_OPTIONS:
-        await message.answer("Выбери из кнопок.")
-        return
-    offset = DAY_OPTIONS[raw]
-    if offset is None:
-        await state.set_state(EditReminderStates.date_value)
-        await message.answer("Дата (DD-MM-YYYY):", reply_markup=ReplyKeyboardRemove())
-        return
-    target_date = date.today() + timedelta(days=offset)
-    await state.update_data(
-        date_value=target_date.strftime("%Y-%m-%d"),
-        day_offset=offset,
-    )
-    await state.set_state(EditReminderStates.time_value)
-    await message.answer("Выбери время или введи вручную:", reply_markup=_time_keyboard())
+async def _advance(
+    message: Message,
+    state: FSMContext,
+    next_state: State,
+    text: str,
+    reply_markup,
+    **data,
+) -> None:
+    # FSM storage writes and sendMessage are independent round-trips (state and data live
+    # under separate storage keys), so issue them concurrently instead of one after another.
+    ops = [state.set_state(next_state), message.answer(text, reply_markup=reply_markup)]
+    if data:
+        ops.append(state.update_data(**data))
+    await asyncio.gather(*ops)
+
+
+def _make_title_handler(states: ReminderStates):
+    async def title_handler(message: Message, state: FSMContext):
+        title = _clean(message.text)
+        if not title:
+            await message.answer("Название не может быть пустым.")
+            return
+        await _advance(
+            message, state, states.reminder_type, "Тип уведомления:", TYPE_KEYBOARD, title=title
+        )
 
+    return title_handler
 
-@router.message(NewReminderStates.date_value)
-async def new_date_handler(message: Message, state: FSMContext):
-    raw = (message.text or "").strip()
-    try:
-        parse_user_date(raw)
-    except ValueError:
-        await message.answer("Неверный формат. Пример: 20-01-2026 или 20 01 2026")
-        return
-    await state.update_data(date_value=raw)
-    await state.update_data(day_offset=None)
-    await state.set_state(NewReminderStates.time_value)
-    await message.answer("Выбери время или введи вручную:", reply_markup=_time_keyboard())
 
+def _make_type_handler(states: ReminderStates):
+    async def type_handler(message: Message, state: FSMContext):
+        raw = _clean(message.text)
+        reminder_type = TYPE_OPTIONS.get(raw) or raw.lower()
+        if reminder_type not in VALID_TYPES:
+            await message.answer("Неверный тип. Выбери из кнопок.")
+            return
+        if reminder_type == "cron":
+            await _advance(
+                message,
+                state,
+                states.cron_expr,
+                CRON_HELP_TEXT,
+                REMOVE_KEYBOARD,
+                reminder_type=reminder_type,
+            )
+        else:
+            await _advance(
+                message,
+                state,
+                states.day_choice,
+                "Когда напомнить?",
+                DAY_KEYBOARD,
+                reminder_type=reminder_type,
+            )
 
-@router.message(EditReminderStates.date_value)
-async def edit_date_handler(message: Message, state: FSMContext):
-    raw = (message.text or "").strip()
-    try:
-        parse_user_date(raw)
-    except ValueError:
-        await message.answer("Неверный формат. Пример: 20-01-2026 или 20 01 2026")
-        return
-    await state.update_data(date_value=raw)
-    await state.update_data(day_offset=None)
-    await state.set_state(EditReminderStates.time_value)
-    await message.answer("Выбери время или введи вручную:", reply_markup=_time_keyboard())
+    return type_handler
 
 
-@router.message(NewReminderStates.time_value)
-async def new_time_handler(message: Message, state: FSMContext, session: AsyncSession):
-    data = await state.get_data()
-    tz_name = settings.default_timezone
-    raw = (message.text or "").strip()
-    if raw in DAY_OPTIONS:
+def _make_day_choice_handler(states: ReminderStates):
+    async def day_choice_handler(message: Message, state: FSMContext):
+        raw = _clean(message.text)
+        if raw not in DAY_OPTIONS:
+            await message.answer("Выбери из кнопок.")
+            return
         offset = DAY_OPTIONS[raw]
         if offset is None:
-            await state.set_state(NewReminderStates.date_value)
-            await message.answer("Дата (DD-MM-YYYY):", reply_markup=ReplyKeyboardRemove())
+            await _advance(message, state, states.date_value, "Дата (DD-MM-YYYY):", REMOVE_KEYBOARD)
             return
-        target_date = date.today() + timedelta(days=offset)
-        await state.update_data(date_value=target_date.strftime("%Y-%m-%d"))
-        await message.answer("Выбери время или введи вручную:", reply_markup=_time_keyboard())
-        return
-    if raw == "Ввести время":
-        await message.answer("Время (HH:MM) или 'H M':", reply_markup=ReplyKeyboardRemove())
-        return
-    if raw in TIME_PRESETS:
-        tz = ZoneInfo(tz_name)
-        base_time = (datetime.now(tz) + TIME_PRESETS[raw]).time()
-        date_value = data.get("date_value")
-        if not date_value:
-            await message.answer("Сначала выбери дату.")
-            return
-        target_date = parse_user_date(date_value)
-        run_local = datetime.combine(target_date, base_time).replace(tzinfo=tz)
-        run_at = run_local.astimezone(UTC)
-    elif raw in FIXED_TIME_OPTIONS:
-        tz = ZoneInfo(tz_name)
-        date_value = data.get("date_value")
-        if not date_value:
-            await message.answer("Сначала выбери дату.")
+        target_date = _today(settings.default_timezone) + timedelta(days=offset)
+        await _advance(
+            message,
+            state,
+            states.time_value,
+            "Выбери время или введи вручную:",
+            TIME_KEYBOARD,
+            date_value=target_date.strftime("%Y-%m-%d"),
+            parsed_date_ord=target_date.toordinal(),
+            day_offset=offset,
+        )
+
+    return day_choice_handler
+
+
+def _make_date_handler(states: ReminderStates):
+    async def date_handler(message: Message, state: FSMContext):
+        raw = _clean(message.text)
+        if not raw:
+            await message.answer("Неверный формат. Пример: 20-01-2026 или 20 01 2026")
             return
-        target_date = parse_user_date(date_value)
-        hour, minute = FIXED_TIME_OPTIONS[raw]
-        run_local = datetime.combine(
-            target_date, datetime.min.time()).replace(tzinfo=tz)
-        run_local = run_local.replace(hour=hour, minute=minute)
-        run_at = run_local.astimezone(UTC)
-    else:
         try:
-            run_at = build_user_datetime(data["date_value"], raw, tz_name)
+            parsed = parse_user_date(raw)
         except ValueError:
-            await message.answer("Неверный формат времени. Пример: 09:30 или 9 30")
+            await message.answer("Неверный формат. Пример: 20-01-2026 или 20 01 2026")
             return
+        await _advance(
+            message,
+            state,
+            states.time_value,
+            "Выбери время или введи вручную:",
+            TIME_KEYBOARD,
+            date_value=raw,
+            parsed_date_ord=parsed.toordinal(),
+            day_offset=None,
+        )
 
-    reminder = await ReminderService(ReminderRepository(session)).create(
-        user_id=(await _get_or_create_user(session, message)).id,
-        title=data["title"],
-        message=data["title"],
-        reminder_type=data["reminder_type"],
-        run_at=run_at,
-        cron_expr=None,
-        timezone=tz_name,
-    )
-    await state.clear()
-    await message.answer(
-        f"Создано уведомление #{reminder.id} на {format_user_datetime(reminder.next_run_at, tz_name)}",
-        reply_markup=ReplyKeyboardRemove(),
-    )
+    return date_handler
 
 
-@router.message(EditReminderStates.time_value)
-async def edit_time_handler(message: Message, state: FSMContext, session: AsyncSession):
-    data = await state.get_data()
-    tz_name = settings.default_timezone
-    raw = (message.text or "").strip()
-    if raw in DAY_OPTIONS:
-        offset = DAY_OPTIONS[raw]
-        if offset is None:
-            await state.set_state(EditReminderStates.date_value)
-            await message.answer("Дата (DD-MM-YYYY):", reply_markup=ReplyKeyboardRemove())
+def _make_time_handler(states: ReminderStates):
+    async def time_handler(
+        message: Message,
+        state: FSMContext,
+        session: AsyncSession,
+        reminder_service: ReminderService,
+    ):
+        raw = _clean(message.text)
+        if not raw:
+            await message.answer("Неверный формат времени. Пример: 09:30 или 9 30")
             return
-        target_date = date.today() + timedelta(days=offset)
-        await state.update_data(date_value=target_date.strftime("%Y-%m-%d"))
-        await message.answer("Выбери время или введи вручную:", reply_markup=_time_keyboard())
-        return
-    if raw == "Ввести время":
-        await message.answer("Время (HH:MM) или 'H M':", reply_markup=ReplyKeyboardRemove())
-        return
-    if raw in TIME_PRESETS:
-        tz = ZoneInfo(tz_name)
-        base_time = (datetime.now(tz) + TIME_PRESETS[raw]).time()
-        date_value = data.get("date_value")
-        if not date_value:
-            await message.answer("Сначала выбери дату.")
+        data = await state.get_data()
+        tz_name = settings.default_timezone
+        if raw in DAY_OPTIONS:
+            offset = DAY_OPTIONS[raw]
+            if offset is None:
+                await state.set_state(states.date_value)
+                await message.answer("Дата (DD-MM-YYYY):", reply_markup=REMOVE_KEYBOARD)
+                return
+            target_date = _today(tz_name) + timedelta(days=offset)
+            await state.update_data(
+                date_value=target_date.strftime("%Y-%m-%d"),
+                parsed_date_ord=target_date.toordinal(),
+            )
+            await message.answer("Выбери время или введи вручную:", reply_markup=TIME_KEYBOARD)
             return
-        target_date = parse_user_date(date_value)
-        run_local = datetime.combine(target_date, base_time).replace(tzinfo=tz)
-        run_at = run_local.astimezone(UTC)
-    elif raw in FIXED_TIME_OPTIONS:
-        tz = ZoneInfo(tz_name)
-        date_value = data.get("date_value")
-        if not date_value:
-            await message.answer("Сначала выбери дату.")
-            return
-        target_date = parse_user_date(date_value)
-        hour, minute = FIXED_TIME_OPTIONS[raw]
-        run_local = datetime.combine(
-            target_date, datetime.min.time()).replace(tzinfo=tz)
-        run_local = run_local.replace(hour=hour, minute=minute)
-        run_at = run_local.astimezone(UTC)
-    else:
-        try:
-            run_at = build_user_datetime(data["date_value"], raw, tz_name)
-        except ValueError:
-            await message.answer("Неверный формат времени. Пример: 09:30 или 9 30")
+        if raw == "Ввести время":
+            await message.answer("Время (HH:MM) или 'H M':", reply_markup=REMOVE_KEYBOARD)
             return
+        if raw in TIME_PRESETS:
+            tz = _tz(tz_name)
+            base_time = (datetime.now(tz) + TIME_PRESETS[raw]).time()
+            target_date = _state_target_date(data)
+            if target_date is None:
+                await message.answer("Сначала выбери дату.")
+                return
+            run_local = datetime.combine(target_date, base_time).replace(tzinfo=tz)
+            run_at = run_local.astimezone(UTC)
+        elif raw in FIXED_TIME_OPTIONS:
+            tz = _tz(tz_name)
+            target_date = _state_target_date(data)
+            if target_date is None:
+                await message.answer("Сначала выбери дату.")
+                return
+            hour, minute = FIXED_TIME_OPTIONS[raw]
+            run_local = datetime(
+                target_date.year, target_date.month, target_date.day, hour, minute, tzinfo=tz
+            )
+            run_at = run_local.astimezone(UTC)
+        else:
+            try:
+                time_part = parse_user_time(raw)
+            except ValueError:
+                await message.answer("Неверный формат времени. Пример: 09:30 или 9 30")
+                return
+            target_date = _state_target_date(data)
+            if target_date is None:
+                await message.answer("Сначала выбери дату.")
+                return
+            run_local = datetime.combine(target_date, time_part).replace(tzinfo=_tz(tz_name))
+            run_at = run_local.astimezone(UTC)
+
+        reminder = await _save_reminder(
+            session,
+            reminder_service,
+            message,
+            data,
+            states,
+            reminder_type=data["reminder_type"],
+            run_at=run_at,
+            cron_expr=None,
+            tz_name=tz_name,
+        )
+        await _answer_saved(message, state, states, reminder, tz_name, reply_markup=REMOVE_KEYBOARD)
 
-    user = await _get_or_create_user(session, message)
-    reminder = await ReminderService(ReminderRepository(session)).get_by_id_for_user(
-        data["reminder_id"], user.id
-    )
-    if not reminder:
-        await state.clear()
-        await message.answer("Уведомление не найдено или не принадлежит тебе.")
-        return
+    return time_handler
 
-    reminder = await ReminderService(ReminderRepository(session)).update(
-        reminder=reminder,
-        title=data["title"],
-        message=data["title"],
-        reminder_type=data["reminder_type"],
-        run_at=run_at,
-        cron_expr=None,
-        timezone=tz_name,
-    )
-    await state.clear()
-    await message.answer(
-        f"Обновлено уведомление #{reminder.id} на {format_user_datetime(reminder.next_run_at, tz_name)}",
-        reply_markup=ReplyKeyboardRemove(),
-    )
 
+def _make_cron_handler(states: ReminderStates):
+    async def cron_handler(
+        message: Message,
+        state: FSMContext,
+        session: AsyncSession,
+        reminder_service: ReminderService,
+    ):
+        cron_expr = _clean(message.text)
+        if not cron_expr:
+            await message.answer("Cron выражение не может быть пустым.")
+            return
+        data = await state.get_data()
+        tz_name = settings.default_timezone
+        try:
+            reminder = await _save_reminder(
+                session,
+                reminder_service,
+                message,
+                data,
+                states,
+                reminder_type="cron",
+                run_at=None,
+                cron_expr=cron_expr,
+                tz_name=tz_name,
+            )
+        except Exception:
+            await message.answer("Не удалось разобрать cron. Пример: 0 9 * * *")
+            return
+        await _answer_saved(message, state, states, reminder, tz_name)
 
-@router.message(NewReminderStates.cron_expr)
-async def new_cron_handler(message: Message, state: FSMContext, session: AsyncSession):
-    data = await state.get_data()
-    tz_name = settings.default_timezone
-    cron_expr = (message.text or "").strip()
-    if not cron_expr:
-        await message.answer("Cron выражение не может быть пустым.")
-        return
-    try:
-        reminder = await ReminderService(ReminderRepository(session)).create(
-            user_id=(await _get_or_create_user(session, message)).id,
-            title=data["title"],
-            message=data["title"],
-            reminder_type="cron",
-            run_at=None,
-            cron_expr=cron_expr,
-            timezone=tz_name,
-        )
-    except Exception:
-        await message.answer("Не удалось разобрать cron. Пример: 0 9 * * *")
-        return
-    await state.clear()
-    await message.answer(
-        f"Создано уведомление #{reminder.id} на {format_user_datetime(reminder.next_run_at, tz_name)}"
-    )
+    return cron_handler
 
 
-@router.message(EditReminderStates.cron_expr)
-async def edit_cron_handler(message: Message, state: FSMContext, session: AsyncSession):
-    data = await state.get_data()
-    tz_name = settings.default_timezone
-    cron_expr = (message.text or "").strip()
-    if not cron_expr:
-        await message.answer("Cron выражение не может быть пустым.")
-        return
-    try:
-        user = await _get_or_create_user(session, message)
-        reminder = await ReminderService(ReminderRepository(session)).get_by_id_for_user(
-            data["reminder_id"], user.id
-        )
-        if not reminder:
-            await state.clear()
-            await message.answer("Уведомление не найдено или не принадлежит тебе.")
-            return
-        reminder = await ReminderService(ReminderRepository(session)).update(
-            reminder=reminder,
-            title=data["title"],
-            message=data["title"],
-            reminder_type="cron",
-            run_at=None,
-            cron_expr=cron_expr,
-            timezone=tz_name,
-        )
-    except Exception:
-        await message.answer("Не удалось разобрать cron. Пример: 0 9 * * *")
-        return
-    await state.clear()
-    await message.answer(
-        f"Обновлено уведомление #{reminder.id} на {format_user_datetime(reminder.next_run_at, tz_name)}"
-    )
+_STEP_FACTORIES = (
+    ("title", _make_title_handler),
+    ("reminder_type", _make_type_handler),
+    ("day_choice", _make_day_choice_handler),
+    ("date_value", _make_date_handler),
+    ("time_value", _make_time_handler),
+    ("cron_expr", _make_cron_handler),
+)
+
+for _states in (NewReminderStates, EditReminderStates):
+    for _step, _make_handler in _STEP_FACTORIES:
+        router.message(getattr(_states, _step))(_make_handler(_states))
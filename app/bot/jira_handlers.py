@@ -1,4 +1,5 @@
 """Jira subscription handlers for Telegram bot."""
+import functools
 import re
 
 from aiogram import Router
@@ -6,26 +7,19 @@ from aiogram.filters import Command
 from aiogram.types import Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.bot.users import get_or_create_user
 from app.config.settings import settings
 from app.repositories.jira_repository import JiraRepository
-from app.repositories.user_repository import UserRepository
 from app.services.jira_service import JiraService
-from app.services.user_service import UserService
 
 
 router = Router()
 
-
-async def _get_or_create_user(session: AsyncSession, message: Message):
-    repo = UserRepository(session)
-    service = UserService(repo)
-    return await service.get_or_create(
-        tg_id=message.from_user.id,
-        username=message.from_user.username,
-        first_name=message.from_user.first_name,
-    )
+_ISSUE_KEY_RE = re.compile(r"^([A-Z][A-Z0-9]+)-(\d+)$")
+_PROJECT_KEY_RE = re.compile(r"^[A-Z][A-Z0-9]+$")
 
 
+@functools.lru_cache(maxsize=1024)
 def _parse_jira_key(text: str) -> tuple[str, str | None]:
     """
     Parse Jira key from text.
@@ -38,13 +32,13 @@ def _parse_jira_key(text: str) -> tuple[str, str | None]:
     text = text.strip().upper()
 
     # Issue key pattern: PROJECT-NUMBER
-    issue_match = re.match(r"^([A-Z][A-Z0-9]+)-(\d+)$", text)
+    issue_match = _ISSUE_KEY_RE.match(text)
     if issue_match:
         project = issue_match.group(1)
         return project, text
 
     # Project key only: PROJECT
-    project_match = re.match(r"^[A-Z][A-Z0-9]+$", text)
+    project_match = _PROJECT_KEY_RE.match(text)
     if project_match:
         return text, None
 
@@ -70,9 +64,9 @@ async def jira_help_handler(message: Message):
 
 
 @router.message(Command("jira_test"))
-async def jira_test_handler(message: Message):
+async def jira_test_handler(message: Message, jira: JiraService | None = None):
     """Test Jira connection."""
-    if not settings.jira_email or not settings.jira_api_token:
+    if jira is None:
         await message.answer(
             "❌ Jira не настроена.\n"
             "Установи JIRA_EMAIL и JIRA_API_TOKEN в .env"
@@ -80,7 +74,6 @@ async def jira_test_handler(message: Message):
         return
 
     try:
-        jira = JiraService()
         user_info = await jira.get_current_user()
         display_name = user_info.get("displayName", "Unknown")
         email = user_info.get("emailAddress", "")
@@ -98,8 +91,6 @@ async def jira_test_handler(message: Message):
 @router.message(Command("jira_watch"))
 async def jira_watch_handler(message: Message, session: AsyncSession):
     """Subscribe to Jira project or issue."""
-    user = await _get_or_create_user(session, message)
-
     args = (message.text or "").split(maxsplit=1)
     if len(args) < 2:
         await message.answer(
@@ -116,18 +107,18 @@ async def jira_watch_handler(message: Message, session: AsyncSession):
         await message.answer(f"❌ {e}")
         return
 
+    # Resolve the user only once the arguments are valid: usage errors skip the DB.
+    user = await get_or_create_user(session, message)
     repo = JiraRepository(session)
 
-    # Check if already subscribed
-    existing = await repo.get_subscription(user.id, project_key, issue_key)
-    if existing:
+    # ON CONFLICT DO NOTHING: None means the subscription already exists
+    created = await repo.create_subscription(user.id, project_key, issue_key) is not None
+    await session.commit()
+    if not created:
         target = issue_key or project_key
         await message.answer(f"⚠️ Ты уже подписан на <b>{target}</b>", parse_mode="HTML")
         return
 
-    # Create subscription
-    await repo.create_subscription(user.id, project_key, issue_key)
-
     if issue_key:
         await message.answer(
             f"✅ Подписка на задачу <b>{issue_key}</b> создана!\n"
@@ -145,8 +136,6 @@ async def jira_watch_handler(message: Message, session: AsyncSession):
 @router.message(Command("jira_unwatch"))
 async def jira_unwatch_handler(message: Message, session: AsyncSession):
     """Unsubscribe from Jira project or issue."""
-    user = await _get_or_create_user(session, message)
-
     args = (message.text or "").split(maxsplit=1)
     if len(args) < 2:
         await message.answer(
@@ -163,8 +152,10 @@ async def jira_unwatch_handler(message: Message, session: AsyncSession):
         await message.answer(f"❌ {e}")
         return
 
+    user = await get_or_create_user(session, message)
     repo = JiraRepository(session)
     deleted = await repo.delete_user_subscription(user.id, project_key, issue_key)
+    await session.commit()
 
     target = issue_key or project_key
     if deleted:
@@ -176,7 +167,7 @@ async def jira_unwatch_handler(message: Message, session: AsyncSession):
 @router.message(Command("jira_list"))
 async def jira_list_handler(message: Message, session: AsyncSession):
     """List user's Jira subscriptions."""
-    user = await _get_or_create_user(session, message)
+    user = await get_or_create_user(session, message)
     repo = JiraRepository(session)
 
     subs = await repo.get_user_subscriptions(user.id)
@@ -190,15 +181,16 @@ async def jira_list_handler(message: Message, session: AsyncSession):
 
     lines = ["📋 <b>Твои подписки на Jira:</b>\n"]
 
+    browse_url = f"{settings.jira_base_url}/browse"
     current_project = None
-    for sub in subs:
-        if sub.project_key != current_project:
-            current_project = sub.project_key
+    for project_key, issue_key in subs:
+        if project_key != current_project:
+            current_project = project_key
             lines.append(f"\n🗂 <b>{current_project}</b>")
 
-        if sub.issue_key:
-            link = f"{settings.jira_base_url}/browse/{sub.issue_key}"
-            lines.append(f"  • <a href='{link}'>{sub.issue_key}</a>")
+        if issue_key:
+            link = f"{browse_url}/{issue_key}"
+            lines.append(f"  • <a href='{link}'>{issue_key}</a>")
         else:
             lines.append("  • Весь проект")
 
@@ -208,36 +200,40 @@ async def jira_list_handler(message: Message, session: AsyncSession):
 
 
 @router.message(Command("jira_check"))
-async def jira_check_handler(message: Message, session: AsyncSession):
+async def jira_check_handler(
+    message: Message,
+    session: AsyncSession,
+    jira: JiraService | None = None,
+):
     """Manually check for Jira updates (for debugging)."""
-    user = await _get_or_create_user(session, message)
+    user = await get_or_create_user(session, message)
     repo = JiraRepository(session)
 
-    subs = await repo.get_user_subscriptions(user.id)
-    if not subs:
+    projects = await repo.get_user_project_keys(user.id)
+    if not projects:
         await message.answer("У тебя нет подписок.")
         return
 
-    if not settings.jira_email or not settings.jira_api_token:
+    if jira is None:
         await message.answer("❌ Jira не настроена.")
         return
 
     try:
-        jira = JiraService()
-        projects = list({s.project_key for s in subs})
-        issues = await jira.get_recently_updated_issues(projects, minutes=60)
+        # A relative JQL window: results a few seconds old answer repeated /jira_check just as well.
+        issues = await jira.get_recently_updated_issues(projects, minutes=60, cache_ttl=30.0)
 
         if not issues:
             await message.answer("📭 Нет обновлений за последний час.")
             return
 
         lines = [f"📬 <b>Обновления за последний час ({len(issues)}):</b>\n"]
+        browse_url = f"{settings.jira_base_url}/browse"
         for issue in issues[:10]:  # Limit to 10
             key = issue.get("key", "???")
             fields = issue.get("fields", {})
             summary = fields.get("summary", "")[:50]
             status = fields.get("status", {}).get("name", "?")
-            link = f"{settings.jira_base_url}/browse/{key}"
+            link = f"{browse_url}/{key}"
             lines.append(f"• <a href='{link}'>{key}</a> [{status}] {summary}")
 
         if len(issues) > 10:
@@ -11,6 +11,7 @@ from app.db import AsyncSessionLocal
 # Optional Jira integration (separate feature)
 try:
     from app.bot.jira_handlers import router as jira_router
+    from app.services.jira_service import JiraService
     HAS_JIRA = True
 except ImportError:
     HAS_JIRA = False
@@ -25,7 +26,15 @@ async def main() -> None:
     dp.include_router(router)
     if HAS_JIRA:
         dp.include_router(jira_router)
-    await dp.start_polling(bot)
+        # One client for all Jira commands; handlers get it as the `jira` argument.
+        if settings.jira_email and settings.jira_api_token:
+            dp["jira"] = JiraService()
+    try:
+        await dp.start_polling(bot)
+    finally:
+        jira = dp.workflow_data.get("jira")
+        if jira is not None:
+            await jira.aclose()
 
 
 if __name__ == "__main__":
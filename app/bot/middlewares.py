@@ -1,6 +1,10 @@
 from aiogram.dispatcher.middlewares.base import BaseMiddleware
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
+from app.repositories.core_tasks_repository import CoreTasksRepository
+from app.repositories.reminder_repository import ReminderRepository
+from app.services.reminder_service import ReminderService
+
 
 class DBSessionMiddleware(BaseMiddleware):
     def __init__(self, sessionmaker: async_sessionmaker) -> None:
@@ -10,8 +14,13 @@ class DBSessionMiddleware(BaseMiddleware):
     async def __call__(self, handler, event, data):
         async with self._sessionmaker() as session:
             data["session"] = session
+            data["reminder_service"] = ReminderService(ReminderRepository(session))
+            data["core_tasks_repo"] = CoreTasksRepository(session)
             try:
                 result = await handler(event, data)
+                # Unconditional on purpose: most writes are Core/text() statements that
+                # session.new/dirty do not track, and a session with no open transaction
+                # commits without a round-trip anyway.
                 await session.commit()
                 return result
             except Exception:
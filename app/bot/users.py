@@ -0,0 +1,65 @@
+"""Telegram user -> users row resolution shared by the bot routers."""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from aiogram.types import Message
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repositories.user_repository import UserRepository
+from app.services.user_service import UserService
+
+
+# tg_id -> (user_id, expires_at). Handlers only need the users PK, which never changes.
+USER_CACHE_TTL_SECONDS = 300.0
+USER_CACHE_MAX_SIZE = 10_000
+_user_id_cache: OrderedDict[int, tuple[int, float]] = OrderedDict()
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    id: int
+
+
+def _cached_user_id(tg_id: int) -> int | None:
+    entry = _user_id_cache.get(tg_id)
+    if entry is None:
+        return None
+    user_id, expires_at = entry
+    if expires_at < time.monotonic():
+        _user_id_cache.pop(tg_id, None)
+        return None
+    _user_id_cache.move_to_end(tg_id)
+    return user_id
+
+
+def _remember_user_id(tg_id: int, user_id: int) -> None:
+    _user_id_cache[tg_id] = (user_id, time.monotonic() + USER_CACHE_TTL_SECONDS)
+    _user_id_cache.move_to_end(tg_id)
+    while len(_user_id_cache) > USER_CACHE_MAX_SIZE:
+        _user_id_cache.popitem(last=False)
+
+
+async def get_or_create_user(session: AsyncSession, message: Message) -> CachedUser:
+    tg_id = message.from_user.id
+    user_id = _cached_user_id(tg_id)
+    if user_id is not None:
+        return CachedUser(id=user_id)
+
+    repo = UserRepository(session)
+    service = UserService(repo)
+    user = await service.get_or_create(
+        tg_id=tg_id,
+        username=message.from_user.username,
+        first_name=message.from_user.first_name,
+    )
+    user_id = user.id
+    # Cache only after commit: an id from a rolled back insert must not outlive the session.
+    event.listen(
+        session.sync_session,
+        "after_commit",
+        lambda _session: _remember_user_id(tg_id, user_id),
+        once=True,
+    )
+    return CachedUser(id=user_id)
@@ -19,7 +19,7 @@ def _is_running_tests() -> bool:
     return any("pytest" in arg for arg in sys.argv)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Settings:
     database_url: str = os.getenv(
         "DATABASE_URL",
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, String, Text, func
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, String, Text, func, literal_column
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db import Base
@@ -71,6 +71,14 @@ class JiraSubscription(Base):
 
     __table_args__ = (
         Index("idx_jira_sub_user_project", user_id, project_key),
+        # issue_key is NULL for project-wide subscriptions; COALESCE makes those unique too.
+        Index(
+            "uq_jira_sub_user_proj_issue",
+            user_id,
+            project_key,
+            func.coalesce(issue_key, literal_column("''")),
+            unique=True,
+        ),
     )
 
 
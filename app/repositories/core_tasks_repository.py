@@ -2,216 +2,753 @@ from __future__ import annotations
 
 import hashlib
 import json
-from datetime import datetime
+from collections.abc import Mapping
 
 import sqlalchemy as sa
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
-def _payload_hash(payload: dict) -> str:
-    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
-    return hashlib.sha256(canonical).hexdigest()
+def _canonical_json(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
 
-def _payload_get_int(payload: dict, *path: str) -> int | None:
-    cur = payload
-    for key in path:
-        if not isinstance(cur, dict):
-            return None
-        cur = cur.get(key)
-    if cur is None:
-        return None
-    if isinstance(cur, int):
-        return cur
-    if isinstance(cur, str) and cur.isdigit():
-        return int(cur)
+
+def _payload_hash(canonical: str) -> str:
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _as_int(value) -> int | None:
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        # Group/channel chat ids are negative. isascii() (O(1)) keeps "²"-style digits,
+        # which isdigit() accepts but int() rejects, from raising.
+        digits = value[1:] if value.startswith("-") else value
+        if digits.isascii() and digits.isdigit():
+            return int(value)
+    return None
+
+
+def _as_str(value) -> str | None:
+    return value if isinstance(value, str) and value else None
+
+
+def _sub(payload: dict, key: str) -> dict:
+    value = payload.get(key)
+    return value if isinstance(value, dict) else {}
+
+
+def _extract_event_fields(payload: dict) -> tuple[str | None, int | None, int | None, str | None]:
+    """Pull (event_type, tg_id, chat_id, request_kind) out of an event payload in one pass."""
+    tg = _sub(payload, "tg")
+    request_kind = _as_str(_sub(payload, "request").get("kind"))
+    if request_kind is None:
+        # For user_command events we denormalize command.name into request_kind
+        # so filtering/grouping by kind works for both user_request and user_command.
+        request_kind = _as_str(_sub(payload, "command").get("name"))
+    return (
+        _as_str(payload.get("event_type")),
+        _as_int(tg.get("tg_id")),
+        _as_int(tg.get("chat_id")),
+        request_kind,
+    )
+
+
+def _pick_llm_answer(rows) -> str | None:
+    # rows: latest-first llm_result task_details rows (mappings with `content`).
+    for row in rows:
+        content = row.get("content")
+        if not isinstance(content, dict):
+            continue
+        answer = content.get("answer")
+        if not isinstance(answer, str) or not answer.strip():
+            continue
+        envelope_type = content.get("envelope_type")
+        if isinstance(envelope_type, str) and envelope_type.strip() == "tool_request":
+            continue
+        if isinstance(envelope_type, str) and envelope_type.strip() == "final":
+            return answer.strip()
+        raw = answer.strip()
+        try:
+            obj = json.loads(raw)
+        except Exception:
+            return raw
+        if isinstance(obj, dict) and obj.get("type") == "tool_request":
+            continue
+        if isinstance(obj, dict) and obj.get("type") == "final" and isinstance(obj.get("answer"), str) and obj.get("answer").strip():
+            return obj.get("answer").strip()
+        return raw
     return None
 
-def _payload_get_str(payload: dict, *path: str) -> str | None:
-    cur = payload
-    for key in path:
-        if not isinstance(cur, dict):
-            return None
-        cur = cur.get(key)
-    return cur if isinstance(cur, str) and cur else None
+
+def _event_params(source: str, external_id: str, payload: dict) -> dict:
+    event_type, tg_id, chat_id, request_kind = _extract_event_fields(payload)
+    canonical = _canonical_json(payload)
+    return {
+        "source": source,
+        "external_id": external_id,
+        "payload_hash": _payload_hash(canonical),
+        "payload": canonical,
+        "event_type": event_type,
+        "tg_id": tg_id,
+        "chat_id": chat_id,
+        "request_kind": request_kind,
+    }
+
+
+def _popped_task(row) -> dict | None:
+    # pop_one_task_for_* rows carry the task's latest raw_input so notifiers skip get_raw_input().
+    if not row:
+        return None
+    out = dict(row)
+    ri = out.get("raw_input")
+    out["raw_input"] = dict(ri) if isinstance(ri, dict) else None
+    return out
+
+
+# Keep this as a denylist to stay forward-compatible with new purposes in core.
+# We only exclude reviewer loops; everything else is treated as a candidate result.
+_LLM_PURPOSE_FILTER_SQL = "(content->>'purpose' IS NULL OR content->>'purpose' NOT IN ('question_review', 'review_loop'))"
+
+# Statements are built once at import; TextClause parsing is not repeated per call/poll.
+_INSERT_EVENTS_SQL = sa.text(
+    "INSERT INTO events (source, external_id, payload_hash, payload, event_type, tg_id, chat_id, request_kind) "
+    "SELECT :source, e, h, CAST(p AS jsonb), et, t, c, rk "
+    "FROM unnest(CAST(:external_ids AS text[]), CAST(:hashes AS text[]), CAST(:payloads AS text[]), "
+    "CAST(:event_types AS text[]), CAST(:tg_ids AS bigint[]), CAST(:chat_ids AS bigint[]), "
+    "CAST(:request_kinds AS text[])) WITH ORDINALITY AS x(e, h, p, et, t, c, rk, ord) "
+    "ORDER BY ord "
+    "RETURNING id"
+)
+
+_GET_TASK_ID_BY_EVENT_ID_SQL = sa.text(
+    "SELECT task_id "
+    "FROM task_details "
+    "WHERE kind = 'raw_input' AND CAST(content->>'event_id' AS int) = :event_id "
+    "ORDER BY id DESC LIMIT 1"
+)
+
+_LIST_TASKS_FOR_TG_SQL = sa.text(
+    "SELECT t.id, t.title, t.status, t.created_at, t.updated_at "
+    "FROM tasks t "
+    "JOIN users u ON u.id = t.created_by_user_id "
+    "WHERE u.tg_id = :tg_id "
+    "ORDER BY t.id DESC "
+    "LIMIT :limit"
+)
+
+_LIST_NEEDS_REVIEW_TASKS_FOR_TG_SQL = sa.text(
+    # One DISTINCT ON pass over the user's NEEDS_REVIEW transitions instead of a LATERAL per task.
+    "WITH ut AS ("
+    "  SELECT t.id, t.title, t.status, t.created_at, t.updated_at "
+    "  FROM tasks t "
+    "  JOIN users u ON u.id = t.created_by_user_id "
+    "  WHERE u.tg_id = :tg_id AND t.status = 'NEEDS_REVIEW'"
+    "), "
+    "nr AS ("
+    "  SELECT DISTINCT ON (task_id) task_id, created_at AS needs_review_at "
+    "  FROM task_transitions "
+    "  WHERE to_status = 'NEEDS_REVIEW' AND task_id IN (SELECT id FROM ut) "
+    "  ORDER BY task_id, id DESC"
+    ") "
+    "SELECT ut.id, ut.title, ut.status, ut.created_at, ut.updated_at, nr.needs_review_at "
+    "FROM ut "
+    "LEFT JOIN nr ON nr.task_id = ut.id "
+    "ORDER BY nr.needs_review_at ASC NULLS LAST, ut.updated_at ASC "
+    "LIMIT :limit"
+)
+
+_GET_TASK_SQL = sa.text("SELECT id, title, status, created_at, updated_at FROM tasks WHERE id = :id")
+
+_LATEST_LLM_RESULT_ROWS_SQL = sa.text(
+    "SELECT content "
+    "FROM task_details "
+    "WHERE task_id = :task_id AND kind = 'llm_result' "
+    "AND " + _LLM_PURPOSE_FILTER_SQL + " "
+    "ORDER BY id DESC LIMIT :limit"
+)
+
+_GET_RAW_INPUT_SQL = sa.text(
+    "SELECT content "
+    "FROM task_details "
+    "WHERE task_id = :task_id AND kind = 'raw_input' "
+    "ORDER BY id DESC LIMIT 1"
+)
+
+_GET_LATEST_WAITING_USER_REASON_SQL = sa.text(
+    "SELECT content "
+    "FROM task_details "
+    "WHERE task_id = :task_id AND kind = 'waiting_user_reason' "
+    "ORDER BY id DESC LIMIT 1"
+)
+
+_GET_LATEST_CODEGEN_RESULT_SQL = sa.text(
+    "SELECT content "
+    "FROM task_details "
+    "WHERE task_id = :task_id AND kind = 'codegen_result' "
+    "ORDER BY id DESC LIMIT 1"
+)
+
+_GET_LATEST_CODEGEN_JOB_SQL = sa.text(
+    "SELECT id, status, base_branch, branch_name, pr_url, error, created_at, started_at, finished_at "
+    "FROM codegen_jobs "
+    "WHERE task_id = :task_id "
+    "ORDER BY id DESC LIMIT 1"
+)
+
+_POP_ONE_TASK_FOR_WAITING_USER_NOTIFY_SQL = sa.text(
+    "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, ri.content AS raw_input, "
+    "  COALESCE(lr.llm_request_id, wr.llm_request_id) AS active_llm_request_id, "
+    "  del.status AS delivery_status, del.attempt_no AS delivery_attempt_no, del.next_attempt_at AS delivery_next_attempt_at "
+    "FROM tasks t "
+    "LEFT JOIN LATERAL ("
+    "  SELECT content "
+    "  FROM task_details "
+    "  WHERE task_id = t.id AND kind = 'raw_input' "
+    "  ORDER BY id DESC LIMIT 1"
+    ") ri ON true "
+    "LEFT JOIN LATERAL ("
+    "  SELECT CAST(content->>'llm_request_id' AS int) AS llm_request_id "
+    "  FROM task_details "
+    "  WHERE task_id = t.id AND kind = 'llm_result' "
+    "  ORDER BY id DESC LIMIT 1"
+    ") lr ON true "
+    "LEFT JOIN LATERAL ("
+    "  SELECT CAST(content->>'llm_request_id' AS int) AS llm_request_id "
+    "  FROM task_details "
+    "  WHERE task_id = t.id AND kind = 'waiting_user_reason' "
+    "  ORDER BY id DESC LIMIT 1"
+    ") wr ON true "
+    "LEFT JOIN LATERAL ("
+    "  SELECT "
+    "    d.content->>'status' AS status, "
+    "    NULLIF(d.content->>'attempt_no','')::int AS attempt_no, "
+    "    NULLIF(d.content->>'retryable','')::boolean AS retryable, "
+    "    NULLIF(d.content->>'next_attempt_at','')::timestamptz AS next_attempt_at "
+    "  FROM task_details d "
+    "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
+    "    AND d.content->>'channel' = 'tg' "
+    "    AND d.content->>'message_kind' = 'waiting_user' "
+    "    AND d.content->>'message_version' = '1' "
+    "    AND d.content->>'llm_request_id' = CAST(COALESCE(lr.llm_request_id, wr.llm_request_id) AS text) "
+    "  ORDER BY d.id DESC LIMIT 1"
+    ") del ON true "
+    "WHERE t.status = 'WAITING_USER' "
+    "AND COALESCE(lr.llm_request_id, wr.llm_request_id) IS NOT NULL "
+    "AND NOT EXISTS ("
+    "  SELECT 1 FROM task_details d "
+    "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
+    "    AND d.content->>'channel' = 'tg' "
+    "    AND d.content->>'message_kind' = 'waiting_user' "
+    "    AND d.content->>'message_version' = '1' "
+    "    AND d.content->>'llm_request_id' = CAST(COALESCE(lr.llm_request_id, wr.llm_request_id) AS text) "
+    "    AND d.content->>'status' = 'sent'"
+    ") "
+    "AND ("
+    "  del.status IS NULL "
+    "  OR (del.status = 'failed' AND del.retryable IS TRUE AND (del.next_attempt_at IS NULL OR del.next_attempt_at <= now()))"
+    ") "
+    "ORDER BY t.updated_at ASC "
+    "LIMIT 1 "
+    "FOR UPDATE OF t SKIP LOCKED"
+)
+
+_POP_ONE_TASK_FOR_CODEGEN_NOTIFY_SQL = sa.text(
+    "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, ri.content AS raw_input, "
+    "  cr.codegen_detail_id, "
+    "  del.status AS delivery_status, del.attempt_no AS delivery_attempt_no, del.next_attempt_at AS delivery_next_attempt_at "
+    "FROM tasks t "
+    "LEFT JOIN LATERAL ("
+    "  SELECT content "
+    "  FROM task_details "
+    "  WHERE task_id = t.id AND kind = 'raw_input' "
+    "  ORDER BY id DESC LIMIT 1"
+    ") ri ON true "
+    "JOIN LATERAL ("
+    "  SELECT id AS codegen_detail_id "
+    "  FROM task_details "
+    "  WHERE task_id = t.id AND kind = 'codegen_result' "
+    "  ORDER BY id DESC "
+    "  LIMIT 1"
+    ") cr ON true "
+    "LEFT JOIN LATERAL ("
+    "  SELECT "
+    "    d.content->>'status' AS status, "
+    "    NULLIF(d.content->>'attempt_no','')::int AS attempt_no, "
+    "    NULLIF(d.content->>'retryable','')::boolean AS retryable, "
+    "    NULLIF(d.content->>'next_attempt_at','')::timestamptz AS next_attempt_at "
+    "  FROM task_details d "
+    "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
+    "    AND d.content->>'channel' = 'tg' "
+    "    AND d.content->>'message_kind' = 'codegen' "
+    "    AND d.content->>'message_version' = '1' "
+    "    AND d.content->>'codegen_detail_id' = CAST(cr.codegen_detail_id AS text) "
+    "  ORDER BY d.id DESC LIMIT 1"
+    ") del ON true "
+    "WHERE NOT EXISTS ("
+    "  SELECT 1 FROM task_details d "
+    "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
+    "    AND d.content->>'channel' = 'tg' "
+    "    AND d.content->>'message_kind' = 'codegen' "
+    "    AND d.content->>'message_version' = '1' "
+    "    AND d.content->>'codegen_detail_id' = CAST(cr.codegen_detail_id AS text) "
+    "    AND d.content->>'status' = 'sent'"
+    ") "
+    "AND ("
+    "  del.status IS NULL "
+    "  OR (del.status = 'failed' AND del.retryable IS TRUE AND (del.next_attempt_at IS NULL OR del.next_attempt_at <= now()))"
+    ") "
+    "ORDER BY t.updated_at ASC "
+    "LIMIT 1 "
+    "FOR UPDATE OF t SKIP LOCKED"
+)
+
+_POP_ONE_TASK_FOR_NEEDS_REVIEW_NOTIFY_SQL = sa.text(
+    "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, ri.content AS raw_input, tr.transition_id, "
+    "  del.status AS delivery_status, del.attempt_no AS delivery_attempt_no, del.next_attempt_at AS delivery_next_attempt_at "
+    "FROM tasks t "
+    "LEFT JOIN LATERAL ("
+    "  SELECT content "
+    "  FROM task_details "
+    "  WHERE task_id = t.id AND kind = 'raw_input' "
+    "  ORDER BY id DESC LIMIT 1"
+    ") ri ON true "
+    "JOIN LATERAL ("
+    "  SELECT id AS transition_id "
+    "  FROM task_transitions "
+    "  WHERE task_id = t.id AND to_status = 'NEEDS_REVIEW' "
+    "    AND NOT EXISTS ("
+    "      SELECT 1 FROM task_details d "
+    "      WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
+    "        AND d.content->>'channel' = 'tg' "
+    "        AND d.content->>'message_kind' = 'review_needed' "
+    "        AND d.content->>'message_version' = '1' "
+    "        AND CAST(d.content->>'transition_id' AS int) = task_transitions.id "
+    "        AND d.content->>'status' = 'sent'"
+    "    ) "
+    "  ORDER BY id ASC "
+    "  LIMIT 1"
+    ") tr ON true "
+    "LEFT JOIN LATERAL ("
+    "  SELECT "
+    "    d.content->>'status' AS status, "
+    "    NULLIF(d.content->>'attempt_no','')::int AS attempt_no, "
+    "    NULLIF(d.content->>'retryable','')::boolean AS retryable, "
+    "    NULLIF(d.content->>'next_attempt_at','')::timestamptz AS next_attempt_at "
+    "  FROM task_details d "
+    "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
+    "    AND d.content->>'channel' = 'tg' "
+    "    AND d.content->>'message_kind' = 'review_needed' "
+    "    AND d.content->>'message_version' = '1' "
+    "    AND CAST(d.content->>'transition_id' AS int) = tr.transition_id "
+    "  ORDER BY d.id DESC LIMIT 1"
+    ") del ON true "
+    "WHERE t.status = 'NEEDS_REVIEW' "
+    "AND ("
+    "  del.status IS NULL "
+    "  OR (del.status = 'failed' AND del.retryable IS TRUE AND (del.next_attempt_at IS NULL OR del.next_attempt_at <= now()))"
+    ") "
+    "ORDER BY tr.transition_id ASC "
+    "LIMIT 1 "
+    "FOR UPDATE OF t SKIP LOCKED"
+)
+
+_POP_ONE_TASK_FOR_DONE_NOTIFY_SQL = sa.text(
+    "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, ri.content AS raw_input, tr.transition_id, "
+    "  del.status AS delivery_status, del.attempt_no AS delivery_attempt_no, del.next_attempt_at AS delivery_next_attempt_at "
+    "FROM tasks t "
+    "LEFT JOIN LATERAL ("
+    "  SELECT content "
+    "  FROM task_details "
+    "  WHERE task_id = t.id AND kind = 'raw_input' "
+    "  ORDER BY id DESC LIMIT 1"
+    ") ri ON true "
+    "JOIN LATERAL ("
+    "  SELECT id AS transition_id "
+    "  FROM task_transitions "
+    "  WHERE task_id = t.id AND to_status = 'DONE' "
+    "    AND NOT EXISTS ("
+    "      SELECT 1 FROM task_details d "
+    "      WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
+    "        AND d.content->>'channel' = 'tg' "
+    "        AND d.content->>'message_kind' = 'final' "
+    "        AND d.content->>'message_version' = '1' "
+    "        AND CAST(d.content->>'transition_id' AS int) = task_transitions.id "
+    "        AND d.content->>'status' = 'sent'"
+    "    ) "
+    "  ORDER BY id ASC "
+    "  LIMIT 1"
+    ") tr ON true "
+    "LEFT JOIN LATERAL ("
+    "  SELECT "
+    "    d.content->>'status' AS status, "
+    "    NULLIF(d.content->>'attempt_no','')::int AS attempt_no, "
+    "    NULLIF(d.content->>'retryable','')::boolean AS retryable, "
+    "    NULLIF(d.content->>'next_attempt_at','')::timestamptz AS next_attempt_at "
+    "  FROM task_details d "
+    "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
+    "    AND d.content->>'channel' = 'tg' "
+    "    AND d.content->>'message_kind' = 'final' "
+    "    AND d.content->>'message_version' = '1' "
+    "    AND CAST(d.content->>'transition_id' AS int) = tr.transition_id "
+    "  ORDER BY d.id DESC LIMIT 1"
+    ") del ON true "
+    "WHERE t.status = 'DONE' "
+    "AND EXISTS ("
+    "  SELECT 1 FROM task_details d "
+    "  WHERE d.task_id = t.id AND d.kind = 'raw_input'"
+    ") "
+    "AND ("
+    "  EXISTS ("
+    "    SELECT 1 FROM task_details d "
+    "    WHERE d.task_id = t.id AND d.kind = 'llm_result' AND COALESCE(d.content->>'answer','') <> ''"
+    "      AND (d.content->>'purpose' IS NULL OR d.content->>'purpose' NOT IN ('question_review', 'review_loop')) "
+    "  ) "
+    "  OR EXISTS ("
+    "    SELECT 1 FROM task_details d "
+    "    WHERE d.task_id = t.id AND d.kind = 'codegen_result'"
+    "  )"
+    ") "
+    "AND ("
+    "  del.status IS NULL "
+    "  OR (del.status = 'failed' AND del.retryable IS TRUE AND (del.next_attempt_at IS NULL OR del.next_attempt_at <= now()))"
+    ") "
+    "ORDER BY tr.transition_id ASC "
+    "LIMIT 1 "
+    "FOR UPDATE OF t SKIP LOCKED"
+)
+
+_POP_ONE_TASK_FOR_DONE_NOTIFY_FALLBACK_SQL = sa.text(
+    "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, ri.content AS raw_input, NULL::int AS transition_id, "
+    "  del.status AS delivery_status, del.attempt_no AS delivery_attempt_no, del.next_attempt_at AS delivery_next_attempt_at "
+    "FROM tasks t "
+    "LEFT JOIN LATERAL ("
+    "  SELECT content "
+    "  FROM task_details "
+    "  WHERE task_id = t.id AND kind = 'raw_input' "
+    "  ORDER BY id DESC LIMIT 1"
+    ") ri ON true "
+    "LEFT JOIN LATERAL ("
+    "  SELECT "
+    "    d.content->>'status' AS status, "
+    "    NULLIF(d.content->>'attempt_no','')::int AS attempt_no, "
+    "    NULLIF(d.content->>'retryable','')::boolean AS retryable, "
+    "    NULLIF(d.content->>'next_attempt_at','')::timestamptz AS next_attempt_at "
+    "  FROM task_details d "
+    "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
+    "    AND d.content->>'channel' = 'tg' "
+    "    AND d.content->>'message_kind' = 'final' "
+    "    AND d.content->>'message_version' = '1' "
+    "  ORDER BY d.id DESC LIMIT 1"
+    ") del ON true "
+    "WHERE t.status = 'DONE' "
+    "AND NOT EXISTS ("
+    "  SELECT 1 FROM task_transitions tr "
+    "  WHERE tr.task_id = t.id AND tr.to_status = 'DONE'"
+    ") "
+    "AND EXISTS ("
+    "  SELECT 1 FROM task_details d "
+    "  WHERE d.task_id = t.id AND d.kind = 'raw_input'"
+    ") "
+    "AND NOT EXISTS ("
+    "  SELECT 1 FROM task_details d "
+    "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
+    "    AND d.content->>'channel' = 'tg' "
+    "    AND d.content->>'message_kind' = 'final' "
+    "    AND d.content->>'message_version' = '1' "
+    "    AND d.content->>'status' = 'sent'"
+    ") "
+    "AND ("
+    "  EXISTS ("
+    "    SELECT 1 FROM task_details d "
+    "    WHERE d.task_id = t.id AND d.kind = 'llm_result' AND COALESCE(d.content->>'answer','') <> ''"
+    "      AND (d.content->>'purpose' IS NULL OR d.content->>'purpose' NOT IN ('question_review', 'review_loop')) "
+    "  ) "
+    "  OR EXISTS ("
+    "    SELECT 1 FROM task_details d "
+    "    WHERE d.task_id = t.id AND d.kind = 'codegen_result'"
+    "  )"
+    ") "
+    "AND ("
+    "  del.status IS NULL "
+    "  OR (del.status = 'failed' AND del.retryable IS TRUE AND (del.next_attempt_at IS NULL OR del.next_attempt_at <= now()))"
+    ") "
+    "ORDER BY t.updated_at ASC "
+    "LIMIT 1 "
+    "FOR UPDATE OF t SKIP LOCKED"
+)
+
+_POP_ONE_TASK_FOR_FAILED_NOTIFY_SQL = sa.text(
+    "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, ri.content AS raw_input, tr.transition_id, "
+    "  del.status AS delivery_status, del.attempt_no AS delivery_attempt_no, del.next_attempt_at AS delivery_next_attempt_at "
+    "FROM tasks t "
+    "LEFT JOIN LATERAL ("
+    "  SELECT content "
+    "  FROM task_details "
+    "  WHERE task_id = t.id AND kind = 'raw_input' "
+    "  ORDER BY id DESC LIMIT 1"
+    ") ri ON true "
+    "JOIN LATERAL ("
+    "  SELECT id AS transition_id "
+    "  FROM task_transitions "
+    "  WHERE task_id = t.id AND to_status = 'FAILED' "
+    "    AND NOT EXISTS ("
+    "      SELECT 1 FROM task_details d "
+    "      WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
+    "        AND d.content->>'channel' = 'tg' "
+    "        AND d.content->>'message_kind' = 'failed' "
+    "        AND d.content->>'message_version' = '1' "
+    "        AND CAST(d.content->>'transition_id' AS int) = task_transitions.id "
+    "        AND d.content->>'status' = 'sent'"
+    "    ) "
+    "  ORDER BY id ASC "
+    "  LIMIT 1"
+    ") tr ON true "
+    "LEFT JOIN LATERAL ("
+    "  SELECT "
+    "    d.content->>'status' AS status, "
+    "    NULLIF(d.content->>'attempt_no','')::int AS attempt_no, "
+    "    NULLIF(d.content->>'retryable','')::boolean AS retryable, "
+    "    NULLIF(d.content->>'next_attempt_at','')::timestamptz AS next_attempt_at "
+    "  FROM task_details d "
+    "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
+    "    AND d.content->>'channel' = 'tg' "
+    "    AND d.content->>'message_kind' = 'failed' "
+    "    AND d.content->>'message_version' = '1' "
+    "    AND CAST(d.content->>'transition_id' AS int) = tr.transition_id "
+    "  ORDER BY d.id DESC LIMIT 1"
+    ") del ON true "
+    "WHERE t.status = 'FAILED' "
+    "AND EXISTS ("
+    "  SELECT 1 FROM task_details d "
+    "  WHERE d.task_id = t.id AND d.kind = 'raw_input'"
+    ") "
+    "AND ("
+    "  EXISTS ("
+    "    SELECT 1 FROM task_details d "
+    "    WHERE d.task_id = t.id AND d.kind = 'llm_result' AND COALESCE(d.content->>'error','') <> ''"
+    "      AND (d.content->>'purpose' IS NULL OR d.content->>'purpose' NOT IN ('question_review', 'review_loop')) "
+    "  ) "
+    "  OR EXISTS ("
+    "    SELECT 1 FROM codegen_jobs cj "
+    "    WHERE cj.task_id = t.id AND COALESCE(cj.error,'') <> ''"
+    "  )"
+    ") "
+    "AND ("
+    "  del.status IS NULL "
+    "  OR (del.status = 'failed' AND del.retryable IS TRUE AND (del.next_attempt_at IS NULL OR del.next_attempt_at <= now()))"
+    ") "
+    "ORDER BY tr.transition_id ASC "
+    "LIMIT 1 "
+    "FOR UPDATE OF t SKIP LOCKED"
+)
+
+_POP_ONE_TASK_FOR_STOPPED_NOTIFY_SQL = sa.text(
+    "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, ri.content AS raw_input, tr.transition_id, "
+    "  del.status AS delivery_status, del.attempt_no AS delivery_attempt_no, del.next_attempt_at AS delivery_next_attempt_at "
+    "FROM tasks t "
+    "LEFT JOIN LATERAL ("
+    "  SELECT content "
+    "  FROM task_details "
+    "  WHERE task_id = t.id AND kind = 'raw_input' "
+    "  ORDER BY id DESC LIMIT 1"
+    ") ri ON true "
+    "JOIN LATERAL ("
+    "  SELECT id AS transition_id "
+    "  FROM task_transitions "
+    "  WHERE task_id = t.id AND to_status = 'STOPPED_BY_USER' "
+    "    AND NOT EXISTS ("
+    "      SELECT 1 FROM task_details d "
+    "      WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
+    "        AND d.content->>'channel' = 'tg' "
+    "        AND d.content->>'message_kind' = 'stopped' "
+    "        AND d.content->>'message_version' = '1' "
+    "        AND CAST(d.content->>'transition_id' AS int) = task_transitions.id "
+    "        AND d.content->>'status' = 'sent'"
+    "    ) "
+    "  ORDER BY id ASC "
+    "  LIMIT 1"
+    ") tr ON true "
+    "LEFT JOIN LATERAL ("
+    "  SELECT "
+    "    d.content->>'status' AS status, "
+    "    NULLIF(d.content->>'attempt_no','')::int AS attempt_no, "
+    "    NULLIF(d.content->>'retryable','')::boolean AS retryable, "
+    "    NULLIF(d.content->>'next_attempt_at','')::timestamptz AS next_attempt_at "
+    "  FROM task_details d "
+    "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
+    "    AND d.content->>'channel' = 'tg' "
+    "    AND d.content->>'message_kind' = 'stopped' "
+    "    AND d.content->>'message_version' = '1' "
+    "    AND CAST(d.content->>'transition_id' AS int) = tr.transition_id "
+    "  ORDER BY d.id DESC LIMIT 1"
+    ") del ON true "
+    "WHERE t.status = 'STOPPED_BY_USER' "
+    "AND EXISTS ("
+    "  SELECT 1 FROM task_details d "
+    "  WHERE d.task_id = t.id AND d.kind = 'raw_input'"
+    ") "
+    "AND ("
+    "  del.status IS NULL "
+    "  OR (del.status = 'failed' AND del.retryable IS TRUE AND (del.next_attempt_at IS NULL OR del.next_attempt_at <= now()))"
+    ") "
+    "ORDER BY tr.transition_id ASC "
+    "LIMIT 1 "
+    "FOR UPDATE OF t SKIP LOCKED"
+)
+
+_POP_ONE_TASK_FOR_LLM_REQUEUE_NOTIFY_SQL = sa.text(
+    "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, ri.content AS raw_input, d.content AS requeue_detail "
+    "FROM tasks t "
+    "LEFT JOIN LATERAL ("
+    "  SELECT content "
+    "  FROM task_details "
+    "  WHERE task_id = t.id AND kind = 'raw_input' "
+    "  ORDER BY id DESC LIMIT 1"
+    ") ri ON true "
+    "JOIN LATERAL ("
+    "  SELECT content "
+    "  FROM task_details "
+    "  WHERE task_id = t.id AND kind = 'llm_request_requeued' "
+    "  ORDER BY id DESC "
+    "  LIMIT 1"
+    ") d ON true "
+    "WHERE t.status IN ('RUNNING', 'NEEDS_LLM_REVIEW') "
+    "AND NOT EXISTS ("
+    "  SELECT 1 FROM task_details n "
+    "  WHERE n.task_id = t.id "
+    "    AND n.kind = 'tg_llm_requeue_notified' "
+    "    AND n.content->>'llm_request_id' = d.content->>'llm_request_id'"
+    ") "
+    "ORDER BY t.updated_at ASC "
+    "LIMIT 1 "
+    "FOR UPDATE OF t SKIP LOCKED"
+)
+
+_GET_LATEST_LLM_RESPONSE_BY_REQUEST_ID_SQL = sa.text(
+    "SELECT id, llm_request_id, task_id, backend, model, answer, error, created_at "
+    "FROM llm_responses "
+    "WHERE llm_request_id = :rid "
+    "ORDER BY id DESC LIMIT 1"
+)
+
+_INSERT_TASK_DETAIL_SQL = sa.text(
+    "INSERT INTO task_details (task_id, kind, content) "
+    "VALUES (:task_id, :kind, CAST(:content AS jsonb)) "
+    "RETURNING id"
+)
+
+_TRANSITION_TASK_SQL = sa.text(
+    "WITH sys AS ("
+    "  INSERT INTO users (tg_id, username, first_name) "
+    "  VALUES (0, 'system', 'system') "
+    "  ON CONFLICT (tg_id) DO UPDATE SET username = EXCLUDED.username, first_name = EXCLUDED.first_name "
+    "  RETURNING id"
+    "), "
+    "updated AS ("
+    "  UPDATE tasks "
+    "  SET status = :to_status, updated_at = now() "
+    "  WHERE id = :task_id AND status = :from_status "
+    "  RETURNING id"
+    ") "
+    "INSERT INTO task_transitions (task_id, from_status, to_status, actor_user_id, reason) "
+    "SELECT updated.id, :from_status, :to_status, sys.id, :reason "
+    "FROM updated, sys"
+)
 
 
 class CoreTasksRepository:
     def __init__(self, session: AsyncSession):
         self._session = session
 
-    def _llm_purpose_filter_sql(self) -> str:
-        # Keep this as a denylist to stay forward-compatible with new purposes in core.
-        # We only exclude reviewer loops; everything else is treated as a candidate result.
-        return "(content->>'purpose' IS NULL OR content->>'purpose' NOT IN ('question_review', 'review_loop'))"
-
     async def insert_event(self, *, source: str, external_id: str, payload: dict) -> int:
-        event_type = _payload_get_str(payload, "event_type")
-        tg_id = _payload_get_int(payload, "tg", "tg_id")
-        chat_id = _payload_get_int(payload, "tg", "chat_id")
-        request_kind = _payload_get_str(payload, "request", "kind")
-        if request_kind is None:
-            # For user_command events we denormalize command.name into request_kind
-            # so filtering/grouping by kind works for both user_request and user_command.
-            request_kind = _payload_get_str(payload, "command", "name")
-
+        # Single-row case of insert_events, so both paths share one INSERT statement.
+        (event_id,) = await self.insert_events(source=source, events=[(external_id, payload)])
+        return event_id
+
+    async def insert_events(self, *, source: str, events: list[tuple[str, dict]]) -> list[int]:
+        """Insert (external_id, payload) pairs in one UNNEST statement; return ids in input order."""
+        if not events:
+            return []
+        rows = [_event_params(source, external_id, payload) for external_id, payload in events]
         res = await self._session.execute(
-            sa.text(
-                "INSERT INTO events (source, external_id, payload_hash, payload, event_type, tg_id, chat_id, request_kind) "
-                "VALUES (:source, :external_id, :payload_hash, CAST(:payload AS jsonb), :event_type, :tg_id, :chat_id, :request_kind) "
-                "RETURNING id"
-            ),
+            _INSERT_EVENTS_SQL,
             {
                 "source": source,
-                "external_id": external_id,
-                "payload_hash": _payload_hash(payload),
-                "payload": json.dumps(payload, ensure_ascii=False, sort_keys=True),
-                "event_type": event_type,
-                "tg_id": tg_id,
-                "chat_id": chat_id,
-                "request_kind": request_kind,
+                "external_ids": [r["external_id"] for r in rows],
+                "hashes": [r["payload_hash"] for r in rows],
+                "payloads": [r["payload"] for r in rows],
+                "event_types": [r["event_type"] for r in rows],
+                "tg_ids": [r["tg_id"] for r in rows],
+                "chat_ids": [r["chat_id"] for r in rows],
+                "request_kinds": [r["request_kind"] for r in rows],
             },
         )
-        return int(res.scalar_one())
+        return [int(x) for x in res.scalars().all()]
 
     async def get_task_id_by_event_id(self, *, event_id: int) -> int | None:
         res = await self._session.execute(
-            sa.text(
-                "SELECT task_id "
-                "FROM task_details "
-                "WHERE kind = 'raw_input' AND CAST(content->>'event_id' AS int) = :event_id "
-                "ORDER BY id DESC LIMIT 1"
-            ),
+            _GET_TASK_ID_BY_EVENT_ID_SQL,
             {"event_id": event_id},
         )
         task_id = res.scalar_one_or_none()
         return int(task_id) if isinstance(task_id, int) else None
 
-    async def list_tasks_for_tg(self, *, tg_id: int, limit: int = 20) -> list[dict]:
+    async def list_tasks_for_tg(self, *, tg_id: int, limit: int = 20) -> list[Mapping]:
         limit = max(min(int(limit), 100), 1)
         res = await self._session.execute(
-            sa.text(
-                "SELECT t.id, t.title, t.status, t.created_at, t.updated_at "
-                "FROM tasks t "
-                "JOIN users u ON u.id = t.created_by_user_id "
-                "WHERE u.tg_id = :tg_id "
-                "ORDER BY t.id DESC "
-                "LIMIT :limit"
-            ),
+            _LIST_TASKS_FOR_TG_SQL,
             {"tg_id": tg_id, "limit": limit},
         )
-        return [dict(r) for r in res.mappings().all()]
+        return list(res.mappings().all())
 
-    async def list_needs_review_tasks_for_tg(self, *, tg_id: int, limit: int = 50) -> list[dict]:
+    async def list_needs_review_tasks_for_tg(self, *, tg_id: int, limit: int = 50) -> list[Mapping]:
         limit = max(min(int(limit), 200), 1)
         res = await self._session.execute(
-            sa.text(
-                "SELECT "
-                "  t.id, t.title, t.status, t.created_at, t.updated_at, tr.needs_review_at "
-                "FROM tasks t "
-                "JOIN users u ON u.id = t.created_by_user_id "
-                "LEFT JOIN LATERAL ("
-                "  SELECT created_at AS needs_review_at "
-                "  FROM task_transitions "
-                "  WHERE task_id = t.id AND to_status = 'NEEDS_REVIEW' "
-                "  ORDER BY id DESC "
-                "  LIMIT 1"
-                ") tr ON true "
-                "WHERE u.tg_id = :tg_id AND t.status = 'NEEDS_REVIEW' "
-                "ORDER BY tr.needs_review_at ASC NULLS LAST, t.updated_at ASC "
-                "LIMIT :limit"
-            ),
+            _LIST_NEEDS_REVIEW_TASKS_FOR_TG_SQL,
             {"tg_id": tg_id, "limit": limit},
         )
-        rows = []
-        for r in res.mappings().all():
-            d = dict(r)
-            nra = d.get("needs_review_at")
-            if isinstance(nra, datetime):
-                d["needs_review_at"] = nra
-            else:
-                d["needs_review_at"] = None
-            rows.append(d)
-        return rows
+        # Read-only rows: needs_review_at is already a datetime or NULL (LEFT JOIN), no copy needed.
+        return list(res.mappings().all())
 
     async def get_task(self, *, task_id: int) -> dict | None:
         res = await self._session.execute(
-            sa.text("SELECT id, title, status, created_at, updated_at FROM tasks WHERE id = :id"),
+            _GET_TASK_SQL,
             {"id": task_id},
         )
         row = res.mappings().first()
         return dict(row) if row else None
 
-    async def get_latest_llm_answer(self, *, task_id: int) -> str | None:
+    async def _latest_llm_result_rows(self, *, task_id: int, limit: int):
         res = await self._session.execute(
-            sa.text(
-                "SELECT content "
-                "FROM task_details "
-                "WHERE task_id = :task_id AND kind = 'llm_result' "
-                "AND " + self._llm_purpose_filter_sql() + " "
-                "ORDER BY id DESC LIMIT 5"
-            ),
-            {"task_id": task_id},
+            _LATEST_LLM_RESULT_ROWS_SQL,
+            {"task_id": task_id, "limit": limit},
         )
-        rows = res.mappings().all()
-        for row in rows:
-            content = row.get("content")
-            if not isinstance(content, dict):
-                continue
-            answer = content.get("answer")
-            if not isinstance(answer, str) or not answer.strip():
-                continue
-            envelope_type = content.get("envelope_type")
-            if isinstance(envelope_type, str) and envelope_type.strip() == "tool_request":
-                continue
-            if isinstance(envelope_type, str) and envelope_type.strip() == "final":
-                return answer.strip()
-            raw = answer.strip()
-            try:
-                obj = json.loads(raw)
-            except Exception:
-                return raw
-            if isinstance(obj, dict) and obj.get("type") == "tool_request":
-                continue
-            if isinstance(obj, dict) and obj.get("type") == "final" and isinstance(obj.get("answer"), str) and obj.get("answer").strip():
-                return obj.get("answer").strip()
-            return raw
-        return None
+        return res.mappings().all()
+
+    async def get_latest_llm_answer(self, *, task_id: int) -> str | None:
+        return _pick_llm_answer(await self._latest_llm_result_rows(task_id=task_id, limit=5))
+
+    async def get_latest_llm_result_and_answer(self, *, task_id: int) -> tuple[dict | None, str | None]:
+        """get_latest_llm_result() and get_latest_llm_answer() from a single query."""
+        rows = await self._latest_llm_result_rows(task_id=task_id, limit=5)
+        content = rows[0].get("content") if rows else None
+        return (dict(content) if isinstance(content, dict) else None), _pick_llm_answer(rows)
 
     async def get_raw_input(self, *, task_id: int) -> dict | None:
         res = await self._session.execute(
-            sa.text(
-                "SELECT content "
-                "FROM task_details "
-                "WHERE task_id = :task_id AND kind = 'raw_input' "
-                "ORDER BY id DESC LIMIT 1"
-            ),
+            _GET_RAW_INPUT_SQL,
             {"task_id": task_id},
         )
         row = res.mappings().first()
         return dict(row["content"]) if row and isinstance(row.get("content"), dict) else None
 
     async def get_latest_llm_result(self, *, task_id: int) -> dict | None:
-        res = await self._session.execute(
-            sa.text(
-                "SELECT content "
-                "FROM task_details "
-                "WHERE task_id = :task_id AND kind = 'llm_result' "
-                "AND " + self._llm_purpose_filter_sql() + " "
-                "ORDER BY id DESC LIMIT 1"
-            ),
-            {"task_id": task_id},
-        )
-        row = res.mappings().first()
+        rows = await self._latest_llm_result_rows(task_id=task_id, limit=1)
+        row = rows[0] if rows else None
         return dict(row["content"]) if row and isinstance(row.get("content"), dict) else None
 
     async def get_latest_waiting_user_reason(self, *, task_id: int) -> dict | None:
         res = await self._session.execute(
-            sa.text(
-                "SELECT content "
-                "FROM task_details "
-                "WHERE task_id = :task_id AND kind = 'waiting_user_reason' "
-                "ORDER BY id DESC LIMIT 1"
-            ),
+            _GET_LATEST_WAITING_USER_REASON_SQL,
             {"task_id": task_id},
         )
         row = res.mappings().first()
@@ -219,12 +756,7 @@ class CoreTasksRepository:
 
     async def get_latest_codegen_result(self, *, task_id: int) -> dict | None:
         res = await self._session.execute(
-            sa.text(
-                "SELECT content "
-                "FROM task_details "
-                "WHERE task_id = :task_id AND kind = 'codegen_result' "
-                "ORDER BY id DESC LIMIT 1"
-            ),
+            _GET_LATEST_CODEGEN_RESULT_SQL,
             {"task_id": task_id},
         )
         row = res.mappings().first()
@@ -232,453 +764,53 @@ class CoreTasksRepository:
 
     async def get_latest_codegen_job(self, *, task_id: int) -> dict | None:
         res = await self._session.execute(
-            sa.text(
-                "SELECT id, status, base_branch, branch_name, pr_url, error, created_at, started_at, finished_at "
-                "FROM codegen_jobs "
-                "WHERE task_id = :task_id "
-                "ORDER BY id DESC LIMIT 1"
-            ),
+            _GET_LATEST_CODEGEN_JOB_SQL,
             {"task_id": task_id},
         )
         row = res.mappings().first()
         return dict(row) if row else None
 
     async def pop_one_task_for_waiting_user_notify(self) -> dict | None:
-        res = await self._session.execute(
-            sa.text(
-                "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, "
-                "  COALESCE(lr.llm_request_id, wr.llm_request_id) AS active_llm_request_id, "
-                "  del.status AS delivery_status, del.attempt_no AS delivery_attempt_no, del.next_attempt_at AS delivery_next_attempt_at "
-                "FROM tasks t "
-                "LEFT JOIN LATERAL ("
-                "  SELECT CAST(content->>'llm_request_id' AS int) AS llm_request_id "
-                "  FROM task_details "
-                "  WHERE task_id = t.id AND kind = 'llm_result' "
-                "  ORDER BY id DESC LIMIT 1"
-                ") lr ON true "
-                "LEFT JOIN LATERAL ("
-                "  SELECT CAST(content->>'llm_request_id' AS int) AS llm_request_id "
-                "  FROM task_details "
-                "  WHERE task_id = t.id AND kind = 'waiting_user_reason' "
-                "  ORDER BY id DESC LIMIT 1"
-                ") wr ON true "
-                "LEFT JOIN LATERAL ("
-                "  SELECT "
-                "    d.content->>'status' AS status, "
-                "    NULLIF(d.content->>'attempt_no','')::int AS attempt_no, "
-                "    NULLIF(d.content->>'retryable','')::boolean AS retryable, "
-                "    NULLIF(d.content->>'next_attempt_at','')::timestamptz AS next_attempt_at "
-                "  FROM task_details d "
-                "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
-                "    AND d.content->>'channel' = 'tg' "
-                "    AND d.content->>'message_kind' = 'waiting_user' "
-                "    AND d.content->>'message_version' = '1' "
-                "    AND d.content->>'llm_request_id' = CAST(COALESCE(lr.llm_request_id, wr.llm_request_id) AS text) "
-                "  ORDER BY d.id DESC LIMIT 1"
-                ") del ON true "
-                "WHERE t.status = 'WAITING_USER' "
-                "AND COALESCE(lr.llm_request_id, wr.llm_request_id) IS NOT NULL "
-                "AND NOT EXISTS ("
-                "  SELECT 1 FROM task_details d "
-                "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
-                "    AND d.content->>'channel' = 'tg' "
-                "    AND d.content->>'message_kind' = 'waiting_user' "
-                "    AND d.content->>'message_version' = '1' "
-                "    AND d.content->>'llm_request_id' = CAST(COALESCE(lr.llm_request_id, wr.llm_request_id) AS text) "
-                "    AND d.content->>'status' = 'sent'"
-                ") "
-                "AND ("
-                "  del.status IS NULL "
-                "  OR (del.status = 'failed' AND del.retryable IS TRUE AND (del.next_attempt_at IS NULL OR del.next_attempt_at <= now()))"
-                ") "
-                "ORDER BY t.updated_at ASC "
-                "LIMIT 1 "
-                "FOR UPDATE OF t SKIP LOCKED"
-            )
-        )
-        row = res.mappings().first()
-        return dict(row) if row else None
+        res = await self._session.execute(_POP_ONE_TASK_FOR_WAITING_USER_NOTIFY_SQL)
+        return _popped_task(res.mappings().first())
 
     async def pop_one_task_for_codegen_notify(self) -> dict | None:
-        res = await self._session.execute(
-            sa.text(
-                "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, "
-                "  cr.codegen_detail_id, "
-                "  del.status AS delivery_status, del.attempt_no AS delivery_attempt_no, del.next_attempt_at AS delivery_next_attempt_at "
-                "FROM tasks t "
-                "JOIN LATERAL ("
-                "  SELECT id AS codegen_detail_id "
-                "  FROM task_details "
-                "  WHERE task_id = t.id AND kind = 'codegen_result' "
-                "  ORDER BY id DESC "
-                "  LIMIT 1"
-                ") cr ON true "
-                "LEFT JOIN LATERAL ("
-                "  SELECT "
-                "    d.content->>'status' AS status, "
-                "    NULLIF(d.content->>'attempt_no','')::int AS attempt_no, "
-                "    NULLIF(d.content->>'retryable','')::boolean AS retryable, "
-                "    NULLIF(d.content->>'next_attempt_at','')::timestamptz AS next_attempt_at "
-                "  FROM task_details d "
-                "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
-                "    AND d.content->>'channel' = 'tg' "
-                "    AND d.content->>'message_kind' = 'codegen' "
-                "    AND d.content->>'message_version' = '1' "
-                "    AND d.content->>'codegen_detail_id' = CAST(cr.codegen_detail_id AS text) "
-                "  ORDER BY d.id DESC LIMIT 1"
-                ") del ON true "
-                "WHERE NOT EXISTS ("
-                "  SELECT 1 FROM task_details d "
-                "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
-                "    AND d.content->>'channel' = 'tg' "
-                "    AND d.content->>'message_kind' = 'codegen' "
-                "    AND d.content->>'message_version' = '1' "
-                "    AND d.content->>'codegen_detail_id' = CAST(cr.codegen_detail_id AS text) "
-                "    AND d.content->>'status' = 'sent'"
-                ") "
-                "AND ("
-                "  del.status IS NULL "
-                "  OR (del.status = 'failed' AND del.retryable IS TRUE AND (del.next_attempt_at IS NULL OR del.next_attempt_at <= now()))"
-                ") "
-                "ORDER BY t.updated_at ASC "
-                "LIMIT 1 "
-                "FOR UPDATE OF t SKIP LOCKED"
-            )
-        )
-        row = res.mappings().first()
-        return dict(row) if row else None
+        res = await self._session.execute(_POP_ONE_TASK_FOR_CODEGEN_NOTIFY_SQL)
+        return _popped_task(res.mappings().first())
 
     async def pop_one_task_for_needs_review_notify(self) -> dict | None:
-        res = await self._session.execute(
-            sa.text(
-                "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, tr.transition_id, "
-                "  del.status AS delivery_status, del.attempt_no AS delivery_attempt_no, del.next_attempt_at AS delivery_next_attempt_at "
-                "FROM tasks t "
-                "JOIN LATERAL ("
-                "  SELECT id AS transition_id "
-                "  FROM task_transitions "
-                "  WHERE task_id = t.id AND to_status = 'NEEDS_REVIEW' "
-                "    AND NOT EXISTS ("
-                "      SELECT 1 FROM task_details d "
-                "      WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
-                "        AND d.content->>'channel' = 'tg' "
-                "        AND d.content->>'message_kind' = 'review_needed' "
-                "        AND d.content->>'message_version' = '1' "
-                "        AND CAST(d.content->>'transition_id' AS int) = task_transitions.id "
-                "        AND d.content->>'status' = 'sent'"
-                "    ) "
-                "  ORDER BY id ASC "
-                "  LIMIT 1"
-                ") tr ON true "
-                "LEFT JOIN LATERAL ("
-                "  SELECT "
-                "    d.content->>'status' AS status, "
-                "    NULLIF(d.content->>'attempt_no','')::int AS attempt_no, "
-                "    NULLIF(d.content->>'retryable','')::boolean AS retryable, "
-                "    NULLIF(d.content->>'next_attempt_at','')::timestamptz AS next_attempt_at "
-                "  FROM task_details d "
-                "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
-                "    AND d.content->>'channel' = 'tg' "
-                "    AND d.content->>'message_kind' = 'review_needed' "
-                "    AND d.content->>'message_version' = '1' "
-                "    AND CAST(d.content->>'transition_id' AS int) = tr.transition_id "
-                "  ORDER BY d.id DESC LIMIT 1"
-                ") del ON true "
-                "WHERE t.status = 'NEEDS_REVIEW' "
-                "AND ("
-                "  del.status IS NULL "
-                "  OR (del.status = 'failed' AND del.retryable IS TRUE AND (del.next_attempt_at IS NULL OR del.next_attempt_at <= now()))"
-                ") "
-                "ORDER BY tr.transition_id ASC "
-                "LIMIT 1 "
-                "FOR UPDATE OF t SKIP LOCKED"
-            )
-        )
-        row = res.mappings().first()
-        return dict(row) if row else None
+        res = await self._session.execute(_POP_ONE_TASK_FOR_NEEDS_REVIEW_NOTIFY_SQL)
+        return _popped_task(res.mappings().first())
 
     async def pop_one_task_for_done_notify(self) -> dict | None:
-        res = await self._session.execute(
-            sa.text(
-                "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, tr.transition_id, "
-                "  del.status AS delivery_status, del.attempt_no AS delivery_attempt_no, del.next_attempt_at AS delivery_next_attempt_at "
-                "FROM tasks t "
-                "JOIN LATERAL ("
-                "  SELECT id AS transition_id "
-                "  FROM task_transitions "
-                "  WHERE task_id = t.id AND to_status = 'DONE' "
-                "    AND NOT EXISTS ("
-                "      SELECT 1 FROM task_details d "
-                "      WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
-                "        AND d.content->>'channel' = 'tg' "
-                "        AND d.content->>'message_kind' = 'final' "
-                "        AND d.content->>'message_version' = '1' "
-                "        AND CAST(d.content->>'transition_id' AS int) = task_transitions.id "
-                "        AND d.content->>'status' = 'sent'"
-                "    ) "
-                "  ORDER BY id ASC "
-                "  LIMIT 1"
-                ") tr ON true "
-                "LEFT JOIN LATERAL ("
-                "  SELECT "
-                "    d.content->>'status' AS status, "
-                "    NULLIF(d.content->>'attempt_no','')::int AS attempt_no, "
-                "    NULLIF(d.content->>'retryable','')::boolean AS retryable, "
-                "    NULLIF(d.content->>'next_attempt_at','')::timestamptz AS next_attempt_at "
-                "  FROM task_details d "
-                "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
-                "    AND d.content->>'channel' = 'tg' "
-                "    AND d.content->>'message_kind' = 'final' "
-                "    AND d.content->>'message_version' = '1' "
-                "    AND CAST(d.content->>'transition_id' AS int) = tr.transition_id "
-                "  ORDER BY d.id DESC LIMIT 1"
-                ") del ON true "
-                "WHERE t.status = 'DONE' "
-                "AND EXISTS ("
-                "  SELECT 1 FROM task_details d "
-                "  WHERE d.task_id = t.id AND d.kind = 'raw_input'"
-                ") "
-                "AND ("
-                "  EXISTS ("
-                "    SELECT 1 FROM task_details d "
-                "    WHERE d.task_id = t.id AND d.kind = 'llm_result' AND COALESCE(d.content->>'answer','') <> ''"
-                "      AND (d.content->>'purpose' IS NULL OR d.content->>'purpose' NOT IN ('question_review', 'review_loop')) "
-                "  ) "
-                "  OR EXISTS ("
-                "    SELECT 1 FROM task_details d "
-                "    WHERE d.task_id = t.id AND d.kind = 'codegen_result'"
-                "  )"
-                ") "
-                "AND ("
-                "  del.status IS NULL "
-                "  OR (del.status = 'failed' AND del.retryable IS TRUE AND (del.next_attempt_at IS NULL OR del.next_attempt_at <= now()))"
-                ") "
-                "ORDER BY tr.transition_id ASC "
-                "LIMIT 1 "
-                "FOR UPDATE OF t SKIP LOCKED"
-            )
-        )
-        row = res.mappings().first()
-        return dict(row) if row else None
+        res = await self._session.execute(_POP_ONE_TASK_FOR_DONE_NOTIFY_SQL)
+        return _popped_task(res.mappings().first())
 
     async def pop_one_task_for_done_notify_fallback(self) -> dict | None:
         # Fallback path for environments where core may update tasks.status without inserting task_transitions.
         # Uses per-task idempotency: we skip if any 'final' delivery was sent.
-        res = await self._session.execute(
-            sa.text(
-                "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, NULL::int AS transition_id, "
-                "  del.status AS delivery_status, del.attempt_no AS delivery_attempt_no, del.next_attempt_at AS delivery_next_attempt_at "
-                "FROM tasks t "
-                "LEFT JOIN LATERAL ("
-                "  SELECT "
-                "    d.content->>'status' AS status, "
-                "    NULLIF(d.content->>'attempt_no','')::int AS attempt_no, "
-                "    NULLIF(d.content->>'retryable','')::boolean AS retryable, "
-                "    NULLIF(d.content->>'next_attempt_at','')::timestamptz AS next_attempt_at "
-                "  FROM task_details d "
-                "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
-                "    AND d.content->>'channel' = 'tg' "
-                "    AND d.content->>'message_kind' = 'final' "
-                "    AND d.content->>'message_version' = '1' "
-                "  ORDER BY d.id DESC LIMIT 1"
-                ") del ON true "
-                "WHERE t.status = 'DONE' "
-                "AND NOT EXISTS ("
-                "  SELECT 1 FROM task_transitions tr "
-                "  WHERE tr.task_id = t.id AND tr.to_status = 'DONE'"
-                ") "
-                "AND EXISTS ("
-                "  SELECT 1 FROM task_details d "
-                "  WHERE d.task_id = t.id AND d.kind = 'raw_input'"
-                ") "
-                "AND NOT EXISTS ("
-                "  SELECT 1 FROM task_details d "
-                "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
-                "    AND d.content->>'channel' = 'tg' "
-                "    AND d.content->>'message_kind' = 'final' "
-                "    AND d.content->>'message_version' = '1' "
-                "    AND d.content->>'status' = 'sent'"
-                ") "
-                "AND ("
-                "  EXISTS ("
-                "    SELECT 1 FROM task_details d "
-                "    WHERE d.task_id = t.id AND d.kind = 'llm_result' AND COALESCE(d.content->>'answer','') <> ''"
-                "      AND (d.content->>'purpose' IS NULL OR d.content->>'purpose' NOT IN ('question_review', 'review_loop')) "
-                "  ) "
-                "  OR EXISTS ("
-                "    SELECT 1 FROM task_details d "
-                "    WHERE d.task_id = t.id AND d.kind = 'codegen_result'"
-                "  )"
-                ") "
-                "AND ("
-                "  del.status IS NULL "
-                "  OR (del.status = 'failed' AND del.retryable IS TRUE AND (del.next_attempt_at IS NULL OR del.next_attempt_at <= now()))"
-                ") "
-                "ORDER BY t.updated_at ASC "
-                "LIMIT 1 "
-                "FOR UPDATE OF t SKIP LOCKED"
-            )
-        )
-        row = res.mappings().first()
-        return dict(row) if row else None
+        res = await self._session.execute(_POP_ONE_TASK_FOR_DONE_NOTIFY_FALLBACK_SQL)
+        return _popped_task(res.mappings().first())
 
     async def pop_one_task_for_failed_notify(self) -> dict | None:
-        res = await self._session.execute(
-            sa.text(
-                "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, tr.transition_id, "
-                "  del.status AS delivery_status, del.attempt_no AS delivery_attempt_no, del.next_attempt_at AS delivery_next_attempt_at "
-                "FROM tasks t "
-                "JOIN LATERAL ("
-                "  SELECT id AS transition_id "
-                "  FROM task_transitions "
-                "  WHERE task_id = t.id AND to_status = 'FAILED' "
-                "    AND NOT EXISTS ("
-                "      SELECT 1 FROM task_details d "
-                "      WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
-                "        AND d.content->>'channel' = 'tg' "
-                "        AND d.content->>'message_kind' = 'failed' "
-                "        AND d.content->>'message_version' = '1' "
-                "        AND CAST(d.content->>'transition_id' AS int) = task_transitions.id "
-                "        AND d.content->>'status' = 'sent'"
-                "    ) "
-                "  ORDER BY id ASC "
-                "  LIMIT 1"
-                ") tr ON true "
-                "LEFT JOIN LATERAL ("
-                "  SELECT "
-                "    d.content->>'status' AS status, "
-                "    NULLIF(d.content->>'attempt_no','')::int AS attempt_no, "
-                "    NULLIF(d.content->>'retryable','')::boolean AS retryable, "
-                "    NULLIF(d.content->>'next_attempt_at','')::timestamptz AS next_attempt_at "
-                "  FROM task_details d "
-                "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
-                "    AND d.content->>'channel' = 'tg' "
-                "    AND d.content->>'message_kind' = 'failed' "
-                "    AND d.content->>'message_version' = '1' "
-                "    AND CAST(d.content->>'transition_id' AS int) = tr.transition_id "
-                "  ORDER BY d.id DESC LIMIT 1"
-                ") del ON true "
-                "WHERE t.status = 'FAILED' "
-                "AND EXISTS ("
-                "  SELECT 1 FROM task_details d "
-                "  WHERE d.task_id = t.id AND d.kind = 'raw_input'"
-                ") "
-                "AND ("
-                "  EXISTS ("
-                "    SELECT 1 FROM task_details d "
-                "    WHERE d.task_id = t.id AND d.kind = 'llm_result' AND COALESCE(d.content->>'error','') <> ''"
-                "      AND (d.content->>'purpose' IS NULL OR d.content->>'purpose' NOT IN ('question_review', 'review_loop')) "
-                "  ) "
-                "  OR EXISTS ("
-                "    SELECT 1 FROM codegen_jobs cj "
-                "    WHERE cj.task_id = t.id AND COALESCE(cj.error,'') <> ''"
-                "  )"
-                ") "
-                "AND ("
-                "  del.status IS NULL "
-                "  OR (del.status = 'failed' AND del.retryable IS TRUE AND (del.next_attempt_at IS NULL OR del.next_attempt_at <= now()))"
-                ") "
-                "ORDER BY tr.transition_id ASC "
-                "LIMIT 1 "
-                "FOR UPDATE OF t SKIP LOCKED"
-            )
-        )
-        row = res.mappings().first()
-        return dict(row) if row else None
+        res = await self._session.execute(_POP_ONE_TASK_FOR_FAILED_NOTIFY_SQL)
+        return _popped_task(res.mappings().first())
 
     async def pop_one_task_for_stopped_notify(self) -> dict | None:
-        res = await self._session.execute(
-            sa.text(
-                "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, tr.transition_id, "
-                "  del.status AS delivery_status, del.attempt_no AS delivery_attempt_no, del.next_attempt_at AS delivery_next_attempt_at "
-                "FROM tasks t "
-                "JOIN LATERAL ("
-                "  SELECT id AS transition_id "
-                "  FROM task_transitions "
-                "  WHERE task_id = t.id AND to_status = 'STOPPED_BY_USER' "
-                "    AND NOT EXISTS ("
-                "      SELECT 1 FROM task_details d "
-                "      WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
-                "        AND d.content->>'channel' = 'tg' "
-                "        AND d.content->>'message_kind' = 'stopped' "
-                "        AND d.content->>'message_version' = '1' "
-                "        AND CAST(d.content->>'transition_id' AS int) = task_transitions.id "
-                "        AND d.content->>'status' = 'sent'"
-                "    ) "
-                "  ORDER BY id ASC "
-                "  LIMIT 1"
-                ") tr ON true "
-                "LEFT JOIN LATERAL ("
-                "  SELECT "
-                "    d.content->>'status' AS status, "
-                "    NULLIF(d.content->>'attempt_no','')::int AS attempt_no, "
-                "    NULLIF(d.content->>'retryable','')::boolean AS retryable, "
-                "    NULLIF(d.content->>'next_attempt_at','')::timestamptz AS next_attempt_at "
-                "  FROM task_details d "
-                "  WHERE d.task_id = t.id AND d.kind = 'tg_delivery' "
-                "    AND d.content->>'channel' = 'tg' "
-                "    AND d.content->>'message_kind' = 'stopped' "
-                "    AND d.content->>'message_version' = '1' "
-                "    AND CAST(d.content->>'transition_id' AS int) = tr.transition_id "
-                "  ORDER BY d.id DESC LIMIT 1"
-                ") del ON true "
-                "WHERE t.status = 'STOPPED_BY_USER' "
-                "AND EXISTS ("
-                "  SELECT 1 FROM task_details d "
-                "  WHERE d.task_id = t.id AND d.kind = 'raw_input'"
-                ") "
-                "AND ("
-                "  del.status IS NULL "
-                "  OR (del.status = 'failed' AND del.retryable IS TRUE AND (del.next_attempt_at IS NULL OR del.next_attempt_at <= now()))"
-                ") "
-                "ORDER BY tr.transition_id ASC "
-                "LIMIT 1 "
-                "FOR UPDATE OF t SKIP LOCKED"
-            )
-        )
-        row = res.mappings().first()
-        return dict(row) if row else None
+        res = await self._session.execute(_POP_ONE_TASK_FOR_STOPPED_NOTIFY_SQL)
+        return _popped_task(res.mappings().first())
 
     async def pop_one_task_for_llm_requeue_notify(self) -> dict | None:
-        res = await self._session.execute(
-            sa.text(
-                "SELECT t.id, t.title, t.status, t.created_at, t.updated_at, d.content AS requeue_detail "
-                "FROM tasks t "
-                "JOIN LATERAL ("
-                "  SELECT content "
-                "  FROM task_details "
-                "  WHERE task_id = t.id AND kind = 'llm_request_requeued' "
-                "  ORDER BY id DESC "
-                "  LIMIT 1"
-                ") d ON true "
-                "WHERE t.status IN ('RUNNING', 'NEEDS_LLM_REVIEW') "
-                "AND NOT EXISTS ("
-                "  SELECT 1 FROM task_details n "
-                "  WHERE n.task_id = t.id "
-                "    AND n.kind = 'tg_llm_requeue_notified' "
-                "    AND n.content->>'llm_request_id' = d.content->>'llm_request_id'"
-                ") "
-                "ORDER BY t.updated_at ASC "
-                "LIMIT 1 "
-                "FOR UPDATE SKIP LOCKED"
-            )
-        )
-        row = res.mappings().first()
-        if not row:
-            return None
-        out = dict(row)
-        rd = out.get("requeue_detail")
-        out["requeue_detail"] = dict(rd) if isinstance(rd, dict) else None
+        res = await self._session.execute(_POP_ONE_TASK_FOR_LLM_REQUEUE_NOTIFY_SQL)
+        out = _popped_task(res.mappings().first())
+        if out is not None:
+            rd = out.get("requeue_detail")
+            out["requeue_detail"] = dict(rd) if isinstance(rd, dict) else None
         return out
 
     async def get_latest_llm_response_by_request_id(self, *, llm_request_id: int) -> dict | None:
         res = await self._session.execute(
-            sa.text(
-                "SELECT id, llm_request_id, task_id, backend, model, answer, error, created_at "
-                "FROM llm_responses "
-                "WHERE llm_request_id = :rid "
-                "ORDER BY id DESC LIMIT 1"
-            ),
+            _GET_LATEST_LLM_RESPONSE_BY_REQUEST_ID_SQL,
             {"rid": int(llm_request_id)},
         )
         row = res.mappings().first()
@@ -686,12 +818,8 @@ class CoreTasksRepository:
 
     async def insert_task_detail(self, *, task_id: int, kind: str, content: dict) -> int:
         res = await self._session.execute(
-            sa.text(
-                "INSERT INTO task_details (task_id, kind, content) "
-                "VALUES (:task_id, :kind, CAST(:content AS jsonb)) "
-                "RETURNING id"
-            ),
-            {"task_id": task_id, "kind": kind, "content": json.dumps(content, ensure_ascii=False, sort_keys=True)},
+            _INSERT_TASK_DETAIL_SQL,
+            {"task_id": task_id, "kind": kind, "content": _canonical_json(content)},
         )
         return int(res.scalar_one())
 
@@ -704,24 +832,7 @@ class CoreTasksRepository:
         reason: str | None = None,
     ) -> bool:
         res = await self._session.execute(
-            sa.text(
-                "WITH sys AS ("
-                "  INSERT INTO users (tg_id, username, first_name) "
-                "  VALUES (0, 'system', 'system') "
-                "  ON CONFLICT (tg_id) DO UPDATE SET username = EXCLUDED.username, first_name = EXCLUDED.first_name "
-                "  RETURNING id"
-                "), "
-                "updated AS ("
-                "  UPDATE tasks "
-                "  SET status = :to_status, updated_at = now() "
-                "  WHERE id = :task_id AND status = :from_status "
-                "  RETURNING id"
-                ") "
-                "INSERT INTO task_transitions (task_id, from_status, to_status, actor_user_id, reason) "
-                "SELECT updated.id, :from_status, :to_status, sys.id, :reason "
-                "FROM updated, sys "
-                "RETURNING task_id"
-            ),
+            _TRANSITION_TASK_SQL,
             {
                 "task_id": task_id,
                 "from_status": from_status,
@@ -729,5 +840,6 @@ class CoreTasksRepository:
                 "reason": reason,
             },
         )
-        return res.scalar_one_or_none() is not None
+        # The transition row is inserted only if the compare-and-swap UPDATE matched.
+        return res.rowcount > 0
 
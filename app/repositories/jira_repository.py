@@ -3,7 +3,8 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 
-from sqlalchemy import delete, select
+from sqlalchemy import delete, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import JiraLastSeen, JiraSubscription, User
@@ -12,6 +13,7 @@ from app.models import JiraLastSeen, JiraSubscription, User
 UTC = timezone.utc
 
 class JiraRepository:
+    # Writes do not commit: the caller owns the transaction (one commit per logical operation).
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
 
@@ -31,13 +33,22 @@ class JiraRepository:
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
 
-    async def get_user_subscriptions(self, user_id: int) -> list[JiraSubscription]:
-        """Get all subscriptions for a user."""
-        stmt = select(JiraSubscription).where(
+    async def get_user_subscriptions(self, user_id: int) -> list[tuple[str, str | None]]:
+        """Get (project_key, issue_key) of all active subscriptions for a user."""
+        stmt = select(JiraSubscription.project_key, JiraSubscription.issue_key).where(
             JiraSubscription.user_id == user_id,
             JiraSubscription.is_active,
         ).order_by(JiraSubscription.project_key, JiraSubscription.issue_key)
         result = await self.session.execute(stmt)
+        return [tuple(row) for row in result.all()]
+
+    async def get_user_project_keys(self, user_id: int) -> list[str]:
+        """Get distinct project keys the user has active subscriptions in."""
+        stmt = select(JiraSubscription.project_key).where(
+            JiraSubscription.user_id == user_id,
+            JiraSubscription.is_active,
+        ).distinct()
+        result = await self.session.execute(stmt)
         return list(result.scalars().all())
 
     async def get_all_active_subscriptions(self) -> list[JiraSubscription]:
@@ -63,25 +74,34 @@ class JiraRepository:
         project_key: str,
         issue_key: str | None = None,
         watch_type: str = "all",
-    ) -> JiraSubscription:
-        """Create new subscription."""
-        sub = JiraSubscription(
-            user_id=user_id,
-            project_key=project_key.upper(),
-            issue_key=issue_key.upper() if issue_key else None,
-            watch_type=watch_type,
-            is_active=True,
+    ) -> int | None:
+        """Create new subscription; return its id, or None if it already exists."""
+        stmt = (
+            pg_insert(JiraSubscription)
+            .values(
+                user_id=user_id,
+                project_key=project_key.upper(),
+                issue_key=issue_key.upper() if issue_key else None,
+                watch_type=watch_type,
+                is_active=True,
+            )
+            .on_conflict_do_nothing(
+                index_elements=[
+                    JiraSubscription.user_id,
+                    JiraSubscription.project_key,
+                    # Literal, not a bind param, so it matches the index expression.
+                    func.coalesce(JiraSubscription.issue_key, literal_column("''")),
+                ],
+            )
+            .returning(JiraSubscription.id)
         )
-        self.session.add(sub)
-        await self.session.commit()
-        await self.session.refresh(sub)
-        return sub
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
 
     async def delete_subscription(self, subscription_id: int) -> bool:
         """Delete subscription by ID."""
         stmt = delete(JiraSubscription).where(JiraSubscription.id == subscription_id)
         result = await self.session.execute(stmt)
-        await self.session.commit()
         return result.rowcount > 0
 
     async def delete_user_subscription(
@@ -98,7 +118,6 @@ class JiraRepository:
             stmt = stmt.where(JiraSubscription.issue_key.is_(None))
 
         result = await self.session.execute(stmt)
-        await self.session.commit()
         return result.rowcount > 0
 
     # Last seen tracking
@@ -114,25 +133,26 @@ class JiraRepository:
 
     async def update_last_seen(self, user_id: int, project_key: str) -> None:
         """Update last check time for user/project."""
-        stmt = select(JiraLastSeen).where(
-            JiraLastSeen.user_id == user_id,
-            JiraLastSeen.project_key == project_key.upper(),
-        )
-        result = await self.session.execute(stmt)
-        record = result.scalar_one_or_none()
+        await self.update_last_seen_bulk([(user_id, project_key)])
 
+    async def update_last_seen_bulk(self, items: list[tuple[int, str]]) -> None:
+        """Upsert last check time for many (user_id, project_key) pairs in one statement."""
+        if not items:
+            return
         now = datetime.now(UTC)
-        if record:
-            record.last_checked_at = now
-        else:
-            record = JiraLastSeen(
-                user_id=user_id,
-                project_key=project_key.upper(),
-                last_checked_at=now,
-            )
-            self.session.add(record)
-
-        await self.session.commit()
+        # Dedupe: ON CONFLICT DO UPDATE cannot touch the same row twice in one statement.
+        keys = {(user_id, project_key.upper()) for user_id, project_key in items}
+        stmt = pg_insert(JiraLastSeen).values(
+            [
+                {"user_id": user_id, "project_key": project_key, "last_checked_at": now}
+                for user_id, project_key in keys
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[JiraLastSeen.user_id, JiraLastSeen.project_key],
+            set_={"last_checked_at": stmt.excluded.last_checked_at},
+        )
+        await self.session.execute(stmt)
 
     async def get_unique_projects(self) -> list[str]:
         """Get list of unique project keys with active subscriptions."""
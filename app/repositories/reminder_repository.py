@@ -1,10 +1,18 @@
 from datetime import datetime
 
-from sqlalchemy import select
+from sqlalchemy import case, delete, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import contains_eager
 
-from app.models import Reminder, User
+from app.models import Reminder
+
+
+# Display order for /list*: active first, then by the effective run time, undated last.
+_LIST_ORDER = (
+    case((Reminder.status == "active", 0), else_=1),
+    func.coalesce(Reminder.next_run_at, Reminder.run_at).nulls_last(),
+    Reminder.id,
+)
 
 
 class ReminderRepository:
@@ -14,7 +22,7 @@ class ReminderRepository:
     async def list_by_user(self, user_id: int) -> list[Reminder]:
         result = await self._session.execute(
             select(Reminder).where(Reminder.user_id ==
-                                   user_id).order_by(Reminder.next_run_at)
+                                   user_id).order_by(*_LIST_ORDER)
         )
         return list(result.scalars().all())
 
@@ -24,7 +32,7 @@ class ReminderRepository:
             .where(Reminder.user_id == user_id)
             .where(Reminder.next_run_at.is_not(None))
             .where(Reminder.next_run_at <= until_dt)
-            .order_by(Reminder.next_run_at)
+            .order_by(*_LIST_ORDER)
         )
         return list(result.scalars().all())
 
@@ -33,8 +41,9 @@ class ReminderRepository:
     ) -> list[Reminder]:
         result = await self._session.execute(
             select(Reminder)
-            .join(User, User.id == Reminder.user_id)
-            .options(selectinload(Reminder.user))
+            .join(Reminder.user)
+            # Hydrate Reminder.user from the JOIN itself: selectinload issued a second SELECT.
+            .options(contains_eager(Reminder.user))
             .where(Reminder.status == "active")
             .where(Reminder.next_run_at.is_not(None))
             .where(Reminder.next_run_at >= since_dt)
@@ -52,9 +61,10 @@ class ReminderRepository:
         )
         return result.scalar_one_or_none()
 
-    async def update(
+    async def update_for_user(
         self,
-        reminder: Reminder,
+        reminder_id: int,
+        user_id: int,
         *,
         title: str,
         message: str | None,
@@ -63,24 +73,40 @@ class ReminderRepository:
         cron_expr: str | None,
         timezone: str,
         next_run_at: datetime | None,
-    ) -> Reminder:
-        reminder.title = title
-        reminder.message = message
-        reminder.reminder_type = reminder_type
-        reminder.run_at = run_at
-        reminder.cron_expr = cron_expr
-        reminder.timezone = timezone
-        reminder.next_run_at = next_run_at
-        reminder.status = "active"
-        return reminder
+    ) -> Reminder | None:
+        result = await self._session.execute(
+            update(Reminder)
+            .where(Reminder.id == reminder_id, Reminder.user_id == user_id)
+            .values(
+                title=title,
+                message=message,
+                reminder_type=reminder_type,
+                run_at=run_at,
+                cron_expr=cron_expr,
+                timezone=timezone,
+                next_run_at=next_run_at,
+                status="active",
+            )
+            .returning(Reminder)
+        )
+        return result.scalar_one_or_none()
 
-    async def mark_done(self, reminder: Reminder) -> Reminder:
-        reminder.status = "done"
-        reminder.next_run_at = None
-        return reminder
+    async def mark_done_for_user(self, reminder_id: int, user_id: int) -> bool:
+        result = await self._session.execute(
+            update(Reminder)
+            .where(Reminder.id == reminder_id, Reminder.user_id == user_id)
+            .values(status="done", next_run_at=None)
+            .returning(Reminder.id)
+        )
+        return result.scalar_one_or_none() is not None
 
-    async def delete(self, reminder: Reminder) -> None:
-        await self._session.delete(reminder)
+    async def delete_for_user(self, reminder_id: int, user_id: int) -> bool:
+        result = await self._session.execute(
+            delete(Reminder)
+            .where(Reminder.id == reminder_id, Reminder.user_id == user_id)
+            .returning(Reminder.id)
+        )
+        return result.scalar_one_or_none() is not None
 
     async def create(
         self,
@@ -1,4 +1,5 @@
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import User
@@ -12,8 +13,22 @@ class UserRepository:
         result = await self._session.execute(select(User).where(User.tg_id == tg_id))
         return result.scalar_one_or_none()
 
-    async def create(self, *, tg_id: int, username: str | None, first_name: str | None) -> User:
-        user = User(tg_id=tg_id, username=username, first_name=first_name)
-        self._session.add(user)
-        await self._session.flush()
-        return user
+    async def get_or_create(
+        self, *, tg_id: int, username: str | None, first_name: str | None
+    ) -> User:
+        # Plain SELECT for the common case: an existing user costs no row lock, WAL or
+        # users.id sequence value. ON CONFLICT DO NOTHING only covers a concurrent first contact.
+        user = await self.get_by_tg_id(tg_id)
+        if user is not None:
+            return user
+        stmt = (
+            pg_insert(User)
+            .values(tg_id=tg_id, username=username, first_name=first_name)
+            .on_conflict_do_nothing(index_elements=[User.tg_id])
+            .returning(User)
+        )
+        user = (await self._session.execute(stmt)).scalar_one_or_none()
+        if user is not None:
+            return user
+        result = await self._session.execute(select(User).where(User.tg_id == tg_id))
+        return result.scalar_one()
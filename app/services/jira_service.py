@@ -2,6 +2,9 @@
 from __future__ import annotations
 
 import base64
+import copy
+import time
+from collections import OrderedDict
 from datetime import datetime
 from typing import Any
 
@@ -10,12 +13,40 @@ import httpx
 from app.config.settings import settings
 
 
+SEARCH_CACHE_MAX_SIZE = 256
+
+
 class JiraService:
     """Service for interacting with Jira Cloud API."""
 
     def __init__(self) -> None:
         self.base_url = settings.jira_base_url.rstrip("/")
         self._auth_header = self._make_auth_header()
+        # One pooled client per service: keep-alive connections skip a TCP+TLS handshake per call.
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={
+                "Authorization": self._auth_header,
+                "Accept": "application/json",
+            },
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        # (jql, fields, expand) -> (issues, expires_at); only filled for callers passing cache_ttl.
+        # Entries are deep copies in both directions, so callers may freely mutate what they get.
+        self._search_cache: OrderedDict[tuple, tuple[tuple[dict[str, Any], ...], float]] = (
+            OrderedDict()
+        )
+
+    async def aclose(self) -> None:
+        """Close pooled connections."""
+        await self._client.aclose()
+
+    async def __aenter__(self) -> JiraService:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
 
     def _make_auth_header(self) -> str:
         """Create Basic Auth header from email:token."""
@@ -25,89 +56,80 @@ class JiraService:
         encoded = base64.b64encode(credentials.encode()).decode()
         return f"Basic {encoded}"
 
-    async def search_issues(self, jql: str, fields: list[str] | None = None) -> list[dict[str, Any]]:
-        """Search issues using JQL."""
+    async def search_issues(
+        self,
+        jql: str,
+        fields: list[str] | None = None,
+        expand: str | None = None,
+        cache_ttl: float = 0.0,
+    ) -> list[dict[str, Any]]:
+        """Search issues using JQL.
+
+        With cache_ttl > 0 an identical search within that many seconds is served from memory.
+        """
         fields = fields or ["key", "summary", "status", "assignee", "updated"]
-        url = f"{self.base_url}/rest/api/3/search"
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                params={"jql": jql, "fields": ",".join(fields)},
-                headers={
-                    "Authorization": self._auth_header,
-                    "Accept": "application/json",
-                },
-                timeout=30.0,
+        cache_key = (jql, tuple(fields), expand)
+        if cache_ttl > 0:
+            entry = self._search_cache.get(cache_key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._search_cache.move_to_end(cache_key)
+                return copy.deepcopy(list(entry[0]))
+
+        params = {"jql": jql, "fields": ",".join(fields)}
+        if expand:
+            params["expand"] = expand
+        response = await self._client.get("/rest/api/3/search", params=params)
+        response.raise_for_status()
+        issues = response.json().get("issues", [])
+
+        if cache_ttl > 0:
+            self._search_cache[cache_key] = (
+                tuple(copy.deepcopy(issues)),
+                time.monotonic() + cache_ttl,
             )
-            response.raise_for_status()
-            data = response.json()
-            return data.get("issues", [])
+            self._search_cache.move_to_end(cache_key)
+            while len(self._search_cache) > SEARCH_CACHE_MAX_SIZE:
+                self._search_cache.popitem(last=False)
+        return issues
 
     async def get_issue(self, issue_key: str) -> dict[str, Any]:
         """Get single issue by key."""
-        url = f"{self.base_url}/rest/api/3/issue/{issue_key}"
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers={
-                    "Authorization": self._auth_header,
-                    "Accept": "application/json",
-                },
-                timeout=30.0,
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._client.get(f"/rest/api/3/issue/{issue_key}")
+        response.raise_for_status()
+        return response.json()
 
     async def get_issue_changelog(
         self, issue_key: str, since: datetime | None = None
     ) -> list[dict[str, Any]]:
         """Get issue changelog (history of changes)."""
-        url = f"{self.base_url}/rest/api/3/issue/{issue_key}/changelog"
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers={
-                    "Authorization": self._auth_header,
-                    "Accept": "application/json",
-                },
-                timeout=30.0,
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            changes = data.get("values", [])
-
-            if since:
-                # Filter changes after 'since' timestamp
-                filtered = []
-                for change in changes:
-                    created_str = change.get("created", "")
-                    if created_str:
-                        # Jira format: 2024-01-15T10:30:00.000+0000
-                        created = datetime.fromisoformat(
-                            created_str.replace("+0000", "+00:00")
-                        )
-                        if created > since:
-                            filtered.append(change)
-                return filtered
-
-            return changes
+        response = await self._client.get(f"/rest/api/3/issue/{issue_key}/changelog")
+        response.raise_for_status()
+        data = response.json()
+
+        changes = data.get("values", [])
+
+        return _changes_since(changes, since) if since else changes
 
     async def get_recently_updated_issues(
         self,
         project_keys: list[str],
-        minutes: int = 5
+        minutes: int = 5,
+        with_changelog: bool = False,
+        cache_ttl: float = 0.0,
     ) -> list[dict[str, Any]]:
-        """Get issues updated in the last N minutes for given projects."""
+        """Get issues updated in the last N minutes for given projects.
+
+        with_changelog embeds each issue's history (see issue_changes_since), so callers
+        do not need a changelog request per issue.
+        """
         projects_jql = ", ".join(f'"{p}"' for p in project_keys)
         jql = f"project IN ({projects_jql}) AND updated >= -{minutes}m ORDER BY updated DESC"
 
         return await self.search_issues(
             jql,
-            fields=["key", "summary", "status", "assignee", "updated", "project"]
+            fields=["key", "summary", "status", "assignee", "updated", "project"],
+            expand="changelog" if with_changelog else None,
+            cache_ttl=cache_ttl,
         )
 
     async def get_my_issues(self, project_key: str | None = None) -> list[dict[str, Any]]:
@@ -122,35 +144,35 @@ class JiraService:
     async def test_connection(self) -> bool:
         """Test if credentials are valid."""
         try:
-            url = f"{self.base_url}/rest/api/3/myself"
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    url,
-                    headers={
-                        "Authorization": self._auth_header,
-                        "Accept": "application/json",
-                    },
-                    timeout=10.0,
-                )
-                response.raise_for_status()
-                return True
+            response = await self._client.get("/rest/api/3/myself", timeout=10.0)
+            response.raise_for_status()
+            return True
         except Exception:
             return False
 
     async def get_current_user(self) -> dict[str, Any]:
         """Get current authenticated user info."""
-        url = f"{self.base_url}/rest/api/3/myself"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers={
-                    "Authorization": self._auth_header,
-                    "Accept": "application/json",
-                },
-                timeout=10.0,
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._client.get("/rest/api/3/myself", timeout=10.0)
+        response.raise_for_status()
+        return response.json()
+
+
+def _changes_since(changes: list[dict[str, Any]], since: datetime) -> list[dict[str, Any]]:
+    # Jira format: 2024-01-15T10:30:00.000+0300; fromisoformat (3.11+) parses the +HHMM offset
+    # as is. Offsets follow the Jira user's timezone, so the strings are not comparable unparsed.
+    return [
+        change
+        for change in changes
+        if change.get("created") and datetime.fromisoformat(change["created"]) > since
+    ]
+
+
+def issue_changes_since(issue: dict[str, Any], since: datetime) -> list[dict[str, Any]] | None:
+    """Changes after `since` from a search result fetched with_changelog; None if not embedded."""
+    changelog = issue.get("changelog")
+    if not isinstance(changelog, dict):
+        return None
+    return _changes_since(changelog.get("histories", []), since)
 
 
 def format_issue_update(issue: dict[str, Any], changes: list[dict[str, Any]] | None = None) -> str:
@@ -43,10 +43,11 @@ class ReminderService:
     async def get_by_id_for_user(self, reminder_id: int, user_id: int):
         return await self._repo.get_by_id_for_user(reminder_id, user_id)
 
-    async def update(
+    async def update_for_user(
         self,
+        reminder_id: int,
+        user_id: int,
         *,
-        reminder,
         title: str,
         message: str | None,
         reminder_type: str,
@@ -55,8 +56,9 @@ class ReminderService:
         timezone: str,
     ):
         next_run_at = compute_next_run_at(reminder_type, run_at, timezone, cron_expr)
-        return await self._repo.update(
-            reminder,
+        return await self._repo.update_for_user(
+            reminder_id,
+            user_id,
             title=title,
             message=message,
             reminder_type=reminder_type,
@@ -66,8 +68,8 @@ class ReminderService:
             next_run_at=next_run_at,
         )
 
-    async def mark_done(self, reminder):
-        return await self._repo.mark_done(reminder)
+    async def mark_done_for_user(self, reminder_id: int, user_id: int) -> bool:
+        return await self._repo.mark_done_for_user(reminder_id, user_id)
 
-    async def delete(self, reminder):
-        await self._repo.delete(reminder)
+    async def delete_for_user(self, reminder_id: int, user_id: int) -> bool:
+        return await self._repo.delete_for_user(reminder_id, user_id)
@@ -6,7 +6,4 @@ class UserService:
         self._repo = repo
 
     async def get_or_create(self, tg_id: int, username: str | None, first_name: str | None):
-        user = await self._repo.get_by_tg_id(tg_id)
-        if user:
-            return user
-        return await self._repo.create(tg_id=tg_id, username=username, first_name=first_name)
+        return await self._repo.get_or_create(tg_id=tg_id, username=username, first_name=first_name)
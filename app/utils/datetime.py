@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import calendar
-from datetime import datetime, timedelta, timezone
+import copy
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
 from zoneinfo import ZoneInfo
 
 from croniter import croniter
@@ -9,11 +11,44 @@ from croniter import croniter
 
 UTC = timezone.utc
 
+
+@lru_cache(maxsize=512)
+def _zi(name: str) -> ZoneInfo:
+    # ZoneInfo(name) already caches instances, but via a lock + weakref lookup on every call.
+    return ZoneInfo(name)
+
+
+@lru_cache(maxsize=1024)
+def _cron_template(expr: str) -> croniter:
+    # Parsing/expanding the expression is the expensive part of croniter(); do it once per
+    # expression and re-point a copy at the new start time through the public set_current().
+    return croniter(expr)
+
+
+def _digits(*parts: str) -> bool:
+    return all(p.isascii() and p.isdigit() for p in parts)
+
+
 def parse_user_datetime(value: str, tz_name: str) -> datetime:
-    tz = ZoneInfo(tz_name)
+    tz = _zi(tz_name)
+    raw = value.strip()
+    # fromisoformat is much cheaper than strptime, but also takes ISO week dates, offsets etc.,
+    # so only hand it strings already shaped exactly like "YYYY-MM-DD HH:MM[:SS]".
+    if (
+        len(raw) in (16, 19)
+        and raw[4] == raw[7] == "-"
+        and raw[10] == " "
+        and raw[13] == ":"
+        and _digits(raw[:4], raw[5:7], raw[8:10], raw[11:13], raw[14:16])
+        and (len(raw) == 16 or (raw[16] == ":" and _digits(raw[17:])))
+    ):
+        try:
+            return datetime.fromisoformat(raw).replace(tzinfo=tz).astimezone(UTC)
+        except ValueError:
+            pass
     for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S"):
         try:
-            local_dt = datetime.strptime(value.strip(), fmt).replace(tzinfo=tz)
+            local_dt = datetime.strptime(raw, fmt).replace(tzinfo=tz)
             return local_dt.astimezone(UTC)
         except ValueError:
             continue
@@ -22,6 +57,17 @@ def parse_user_datetime(value: str, tz_name: str) -> datetime:
 
 def parse_user_date(value: str) -> datetime.date:
     raw = value.strip()
+    # Hand-parse the fixed-width shapes; strptime is only the fallback for
+    # unpadded input like "5-1-2024".
+    if len(raw) == 10:
+        sep = raw[2]
+        try:
+            if sep in "-." and raw[5] == sep and _digits(raw[:2], raw[3:5], raw[6:]):
+                return date(int(raw[6:]), int(raw[3:5]), int(raw[:2]))
+            if raw[4] == raw[7] == "-" and _digits(raw[:4], raw[5:7], raw[8:]):
+                return date(int(raw[:4]), int(raw[5:7]), int(raw[8:]))
+        except ValueError:
+            pass
     for fmt in ("%d-%m-%Y", "%d.%m.%Y", "%Y-%m-%d"):
         try:
             return datetime.strptime(raw, fmt).date()
@@ -41,6 +87,11 @@ def parse_user_date(value: str) -> datetime.date:
 
 def parse_user_time(value: str) -> datetime.time:
     raw = value.strip()
+    if len(raw) == 5 and raw[2] == ":" and _digits(raw[:2], raw[3:]):
+        hour = int(raw[:2])
+        minute = int(raw[3:])
+        if hour <= 23 and minute <= 59:
+            return time(hour, minute)
     if ":" in raw:
         for fmt in ("%H:%M", "%H:%M:%S"):
             try:
@@ -57,7 +108,7 @@ def parse_user_time(value: str) -> datetime.time:
 
 
 def build_user_datetime(date_value: str, time_value: str, tz_name: str) -> datetime:
-    tz = ZoneInfo(tz_name)
+    tz = _zi(tz_name)
     date_part = parse_user_date(date_value)
     time_part = parse_user_time(time_value)
     local_dt = datetime.combine(date_part, time_part).replace(tzinfo=tz)
@@ -67,7 +118,7 @@ def build_user_datetime(date_value: str, time_value: str, tz_name: str) -> datet
 def format_user_datetime(value: datetime | None, tz_name: str) -> str:
     if value is None:
         return "-"
-    tz = ZoneInfo(tz_name)
+    tz = _zi(tz_name)
     local_dt = value.astimezone(tz)
     return local_dt.strftime("%Y-%m-%d %H:%M")
 
@@ -78,13 +129,15 @@ def compute_next_run_at(
     tz_name: str,
     cron_expr: str | None,
 ) -> datetime | None:
-    tz = ZoneInfo(tz_name)
+    tz = _zi(tz_name)
     now_local = datetime.now(tz)
 
     if reminder_type == "cron":
         if not cron_expr:
             raise ValueError("cron_expr is required for cron reminders")
-        next_dt = croniter(cron_expr, now_local).get_next(datetime)
+        itr = copy.copy(_cron_template(cron_expr))
+        itr.set_current(now_local, force=True)
+        next_dt = itr.get_next(datetime)
         if next_dt.tzinfo is None:
             next_dt = next_dt.replace(tzinfo=tz)
         return next_dt.astimezone(UTC)
@@ -96,16 +149,25 @@ def compute_next_run_at(
     if reminder_type == "one_time":
         return run_local.astimezone(UTC)
 
-    next_local = run_local
-    while next_local <= now_local:
-        if reminder_type == "daily":
-            next_local = next_local + timedelta(days=1)
-        elif reminder_type == "weekly":
-            next_local = next_local + timedelta(weeks=1)
-        elif reminder_type == "monthly":
-            next_local = add_months(next_local, 1)
-        else:
-            raise ValueError("Unsupported reminder_type")
+    if reminder_type in ("daily", "weekly"):
+        step = timedelta(days=1) if reminder_type == "daily" else timedelta(weeks=1)
+        next_local = run_local
+        if next_local <= now_local:
+            # Jump straight to the last missed occurrence instead of stepping one period at a time.
+            next_local += step * ((now_local - run_local) // step)
+            while next_local <= now_local:
+                next_local += step
+    elif reminder_type == "monthly":
+        months = 0
+        if run_local <= now_local:
+            months = (now_local.year - run_local.year) * 12 + now_local.month - run_local.month
+        # Always offset from run_local so a clamped day (31 -> 28) doesn't stick for later months.
+        next_local = add_months(run_local, months)
+        while next_local <= now_local:
+            months += 1
+            next_local = add_months(run_local, months)
+    else:
+        raise ValueError("Unsupported reminder_type")
 
     return next_local.astimezone(UTC)
 
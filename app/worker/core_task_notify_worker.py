@@ -560,7 +560,7 @@ async def _process_one_needs_review(session: AsyncSession, bot: Bot) -> bool:
     transition_id = task.get("transition_id")
     transition_id = int(transition_id) if isinstance(transition_id, int) else None
 
-    raw_input = await repo.get_raw_input(task_id=task_id)
+    raw_input = task["raw_input"]
     llm_result = await repo.get_latest_llm_result(task_id=task_id)
 
     chat_id = _extract_chat_id(raw_input or {})
@@ -640,7 +640,7 @@ async def _process_one_llm_requeue_notify(session: AsyncSession, bot: Bot) -> bo
         return False
 
     task_id = int(task["id"])
-    raw_input = await repo.get_raw_input(task_id=task_id)
+    raw_input = task["raw_input"]
     chat_id = _extract_chat_id(raw_input or {})
     requeue_detail = task.get("requeue_detail") if isinstance(task, dict) else None
     requeue_detail = requeue_detail if isinstance(requeue_detail, dict) else {}
@@ -718,7 +718,7 @@ async def _process_one_waiting_user(session: AsyncSession, bot: Bot) -> bool:
         return False
 
     task_id = int(task["id"])
-    raw_input = await repo.get_raw_input(task_id=task_id)
+    raw_input = task["raw_input"]
     llm_result = await repo.get_latest_llm_result(task_id=task_id)
     waiting_reason = await repo.get_latest_waiting_user_reason(task_id=task_id)
     active_llm_request_id = task.get("active_llm_request_id")
@@ -794,7 +794,7 @@ async def _process_one_codegen_notify(session: AsyncSession, bot: Bot) -> bool:
     task_id = int(task["id"])
     codegen_detail_id = task.get("codegen_detail_id")
     codegen_detail_id = int(codegen_detail_id) if isinstance(codegen_detail_id, int) else None
-    raw_input = await repo.get_raw_input(task_id=task_id)
+    raw_input = task["raw_input"]
     codegen_result = await repo.get_latest_codegen_result(task_id=task_id)
 
     if not raw_input or not codegen_result:
@@ -872,7 +872,7 @@ async def _process_one_done(session: AsyncSession, bot: Bot) -> bool:
     transition_id = task.get("transition_id")
     transition_id = int(transition_id) if isinstance(transition_id, int) else None
 
-    raw_input = await repo.get_raw_input(task_id=task_id)
+    raw_input = task["raw_input"]
     llm_result = await repo.get_latest_llm_result(task_id=task_id)
     codegen_result = await repo.get_latest_codegen_result(task_id=task_id)
 
@@ -977,7 +977,7 @@ async def _process_one_failed(session: AsyncSession, bot: Bot) -> bool:
     transition_id = task.get("transition_id")
     transition_id = int(transition_id) if isinstance(transition_id, int) else None
 
-    raw_input = await repo.get_raw_input(task_id=task_id)
+    raw_input = task["raw_input"]
     llm_result = await repo.get_latest_llm_result(task_id=task_id)
     job = await repo.get_latest_codegen_job(task_id=task_id)
 
@@ -1013,7 +1013,7 @@ async def _process_one_stopped(session: AsyncSession, bot: Bot) -> bool:
     transition_id = task.get("transition_id")
     transition_id = int(transition_id) if isinstance(transition_id, int) else None
 
-    raw_input = await repo.get_raw_input(task_id=task_id)
+    raw_input = task["raw_input"]
     chat_id = _extract_chat_id(raw_input or {})
     msg = _format_stopped_message(task_id=task_id, title=str(task.get("title") or ""))
     await _send_with_tg_delivery_trace(
@@ -10,7 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.settings import settings
 from app.db import AsyncSessionLocal
 from app.repositories.jira_repository import JiraRepository
-from app.services.jira_service import JiraService, format_issue_update
+from app.services.jira_service import JiraService, format_issue_update, issue_changes_since
 
 
 logger = logging.getLogger("jira_worker")
@@ -20,6 +20,7 @@ UTC = timezone.utc
 async def check_jira_updates(
     session: AsyncSession,
     bot: Bot,
+    jira: JiraService,
     lookback_minutes: int,
 ) -> int:
     """Check for Jira updates and notify subscribers."""
@@ -30,14 +31,15 @@ async def check_jira_updates(
     if not projects:
         return 0
 
-    jira = JiraService()
     notified = 0
 
     # Check each project
     lookback_minutes = max(lookback_minutes, 3)  # At least 3 minutes lookback
 
     try:
-        issues = await jira.get_recently_updated_issues(projects, minutes=lookback_minutes)
+        issues = await jira.get_recently_updated_issues(
+            projects, minutes=lookback_minutes, with_changelog=True
+        )
     except Exception as e:
         logger.error("Failed to fetch Jira updates: %s", e)
         return 0
@@ -60,12 +62,14 @@ async def check_jira_updates(
         if not subscribers:
             continue
 
-        # Get changelog for more details (optional, can be slow)
-        try:
-            since = datetime.now(UTC) - timedelta(minutes=lookback_minutes)
-            changes = await jira.get_issue_changelog(key, since=since)
-        except Exception:
-            changes = None
+        # Changelog comes embedded in the search response; fall back to a request if absent
+        since = datetime.now(UTC) - timedelta(minutes=lookback_minutes)
+        changes = issue_changes_since(issue, since)
+        if changes is None:
+            try:
+                changes = await jira.get_issue_changelog(key, since=since)
+            except Exception:
+                changes = None
 
         # Format message
         message = format_issue_update(issue, changes)
@@ -107,15 +111,20 @@ async def run_jira_loop() -> None:
         logger.warning("Jira not configured (JIRA_EMAIL/JIRA_API_TOKEN missing), worker disabled")
         return
 
-    # Test connection on startup
-    try:
-        jira = JiraService()
-        user = await jira.get_current_user()
-        logger.info("Jira connected as: %s", user.get("displayName", "Unknown"))
-    except Exception as e:
-        logger.error("Failed to connect to Jira: %s", e)
-        return
+    async with JiraService() as jira:
+        # Test connection on startup
+        try:
+            user = await jira.get_current_user()
+            logger.info("Jira connected as: %s", user.get("displayName", "Unknown"))
+        except Exception as e:
+            logger.error("Failed to connect to Jira: %s", e)
+            return
+
+        await _poll_forever(jira)
+
 
+async def _poll_forever(jira: JiraService) -> None:
+    """Poll Jira during working hours, reusing one service (and its connection pool)."""
     bot = Bot(token=settings.tg_token)
     poll_seconds = settings.jira_poll_seconds
     tz = ZoneInfo(settings.default_timezone)
@@ -140,7 +149,7 @@ async def run_jira_loop() -> None:
             catchup_minutes = 14 * 60  # 19:00 -> 09:00 = 14 hours
             async with AsyncSessionLocal() as session:
                 try:
-                    notified = await check_jira_updates(session, bot, catchup_minutes)
+                    notified = await check_jira_updates(session, bot, jira, catchup_minutes)
                     if notified:
                         logger.info("Sent %d Jira notifications (morning catch-up)", notified)
                 except Exception as e:
@@ -150,7 +159,7 @@ async def run_jira_loop() -> None:
         async with AsyncSessionLocal() as session:
             try:
                 lookback_minutes = max(poll_seconds // 60 + 1, 3)
-                notified = await check_jira_updates(session, bot, lookback_minutes)
+                notified = await check_jira_updates(session, bot, jira, lookback_minutes)
                 if notified:
                     logger.info("Sent %d Jira notifications", notified)
             except Exception as e:
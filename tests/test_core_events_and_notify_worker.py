@@ -94,6 +94,153 @@ class TestCoreEventsAndNotifyWorker(unittest.IsolatedAsyncioTestCase):
             self.assertEqual(row["request_kind"], "question")
             self.assertEqual(row["et"], "user_request")
 
+    async def _insert_event_and_read_ids(self, tg: dict) -> dict:
+        payload = {"event_type": "user_request", "tg": tg, "request": {"kind": "question", "text": "hi"}}
+        async with _session() as session:
+            repo = CoreTasksRepository(session)
+            event_id = await repo.insert_event(
+                source="telegram", external_id=f"t:{uuid.uuid4()}", payload=payload
+            )
+            await session.commit()
+            res = await session.execute(
+                sa.text("SELECT tg_id, chat_id FROM events WHERE id = :id"),
+                {"id": event_id},
+            )
+            return dict(res.mappings().one())
+
+    async def test_insert_event_keeps_negative_group_chat_ids(self) -> None:
+        row = await self._insert_event_and_read_ids({"tg_id": "777", "chat_id": "-100123"})
+        self.assertEqual(int(row["tg_id"]), 777)
+        self.assertEqual(int(row["chat_id"]), -100123)
+
+    async def test_insert_event_stores_null_for_non_ascii_digit_ids(self) -> None:
+        # "²".isdigit() is True but int("²") raises; the event must still be stored.
+        row = await self._insert_event_and_read_ids({"tg_id": "²", "chat_id": "²"})
+        self.assertIsNone(row["tg_id"])
+        self.assertIsNone(row["chat_id"])
+
+    async def test_insert_events_returns_ids_in_input_order(self) -> None:
+        external_ids = [f"t:{uuid.uuid4()}" for _ in range(3)]
+        events = [
+            (ext, {"event_type": "user_request", "tg": {"tg_id": 500 + i, "chat_id": 600 + i}, "n": i})
+            for i, ext in enumerate(external_ids)
+        ]
+
+        async with _session() as session:
+            repo = CoreTasksRepository(session)
+            self.assertEqual(await repo.insert_events(source="telegram", events=[]), [])
+            event_ids = await repo.insert_events(source="telegram", events=events)
+            await session.commit()
+
+            self.assertEqual(len(event_ids), 3)
+            res = await session.execute(
+                sa.text("SELECT id, external_id, tg_id, chat_id FROM events WHERE id = ANY(:ids)"),
+                {"ids": event_ids},
+            )
+            rows = {int(r["id"]): r for r in res.mappings().all()}
+            for i, event_id in enumerate(event_ids):
+                self.assertEqual(rows[event_id]["external_id"], external_ids[i])
+                self.assertEqual(int(rows[event_id]["tg_id"]), 500 + i)
+                self.assertEqual(int(rows[event_id]["chat_id"]), 600 + i)
+
+    async def test_insert_events_writes_same_columns_as_insert_event(self) -> None:
+        payload = {
+            "event_type": "user_request",
+            "tg": {"tg_id": "777", "chat_id": "-100123", "message_id": 1},
+            "request": {"kind": "question", "text": "привет", "project_id": None, "attachments": []},
+        }
+        columns = "payload_hash, payload, event_type, tg_id, chat_id, request_kind"
+
+        async with _session() as session:
+            repo = CoreTasksRepository(session)
+            single_id = await repo.insert_event(source="telegram", external_id=f"t:{uuid.uuid4()}", payload=payload)
+            (batch_id,) = await repo.insert_events(source="telegram", events=[(f"t:{uuid.uuid4()}", payload)])
+            await session.commit()
+
+            res = await session.execute(
+                sa.text(f"SELECT id, {columns} FROM events WHERE id IN (:a, :b)"),
+                {"a": single_id, "b": batch_id},
+            )
+            rows = {int(r["id"]): {k: v for k, v in r.items() if k != "id"} for r in res.mappings().all()}
+            self.assertEqual(rows[batch_id], rows[single_id])
+            self.assertEqual(rows[batch_id]["request_kind"], "question")
+
+    async def test_insert_events_rejects_duplicate_like_insert_event(self) -> None:
+        payload = {"event_type": "user_request", "tg": {"tg_id": 1, "chat_id": 2}}
+        dup_external_id = f"t:{uuid.uuid4()}"
+        fresh_external_id = f"t:{uuid.uuid4()}"
+
+        async with _session() as session:
+            await CoreTasksRepository(session).insert_event(
+                source="telegram", external_id=dup_external_id, payload=payload
+            )
+            await session.commit()
+
+        async with _session() as session:
+            with self.assertRaises(sa.exc.IntegrityError):
+                await CoreTasksRepository(session).insert_event(
+                    source="telegram", external_id=dup_external_id, payload=payload
+                )
+            await session.rollback()
+
+        async with _session() as session:
+            with self.assertRaises(sa.exc.IntegrityError):
+                await CoreTasksRepository(session).insert_events(
+                    source="telegram",
+                    events=[(fresh_external_id, payload), (dup_external_id, payload)],
+                )
+            await session.rollback()
+
+        async with _session() as session:
+            # The batch is one statement: the non-duplicate row is not inserted either.
+            res = await session.execute(
+                sa.text("SELECT COUNT(1) FROM events WHERE source = 'telegram' AND external_id = :e"),
+                {"e": fresh_external_id},
+            )
+            self.assertEqual(int(res.scalar_one()), 0)
+
+    async def test_pop_one_task_for_llm_requeue_notify_returns_raw_input(self) -> None:
+        async with _session() as session:
+            res = await session.execute(
+                sa.text(
+                    "INSERT INTO users (tg_id, username, first_name) "
+                    "VALUES (:tg_id, NULL, NULL) "
+                    "ON CONFLICT (tg_id) DO UPDATE SET tg_id = EXCLUDED.tg_id "
+                    "RETURNING id"
+                ),
+                {"tg_id": 9010},
+            )
+            user_id = int(res.scalar_one())
+            # Oldest updated_at so the pop (ORDER BY updated_at) picks this task first.
+            res = await session.execute(
+                sa.text(
+                    "INSERT INTO tasks (created_by_user_id, project_id, source, external_key, title, status, updated_at) "
+                    "VALUES (:uid, NULL, 'telegram', NULL, 'requeue', 'RUNNING', '2000-01-01T00:00:00Z') "
+                    "RETURNING id"
+                ),
+                {"uid": user_id},
+            )
+            task_id = int(res.scalar_one())
+            raw_input = {"kind": "question", "text": "Hi", "tg": {"chat_id": 54329, "tg_id": 9010}, "event_id": 1}
+            for kind, content in (
+                ("raw_input", raw_input),
+                ("llm_request_requeued", {"llm_request_id": 77, "requeue_count": 1}),
+            ):
+                await session.execute(
+                    sa.text("INSERT INTO task_details (task_id, kind, content) VALUES (:tid, :kind, CAST(:c AS jsonb))"),
+                    {"tid": task_id, "kind": kind, "c": json.dumps(content, ensure_ascii=False, sort_keys=True)},
+                )
+            await session.commit()
+
+        async with _session() as session:
+            task = await CoreTasksRepository(session).pop_one_task_for_llm_requeue_notify()
+            await session.rollback()
+
+        self.assertIsNotNone(task)
+        self.assertEqual(int(task["id"]), task_id)
+        self.assertEqual(task["raw_input"], raw_input)
+        self.assertEqual(task["requeue_detail"], {"llm_request_id": 77, "requeue_count": 1})
+
     async def test_get_latest_codegen_job_returns_row(self) -> None:
         async with _session() as session:
             # Create user + task
@@ -0,0 +1,101 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+import app.utils.datetime as dt_utils
+from app.utils.datetime import compute_next_run_at, parse_user_datetime
+
+
+def _frozen_now(now: datetime) -> type[datetime]:
+    class _FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):  # type: ignore[override]
+            return now.astimezone(tz)
+
+    return _FrozenDatetime
+
+
+def _monthly_next(run_at: datetime, now: datetime, tz_name: str = "UTC") -> datetime:
+    with mock.patch.object(dt_utils, "datetime", _frozen_now(now)):
+        next_utc = compute_next_run_at("monthly", run_at, tz_name, None)
+    assert next_utc is not None
+    return next_utc.astimezone(ZoneInfo(tz_name))
+
+
+class TestMonthlyNextRunAt(unittest.TestCase):
+    def test_end_of_month_days_clamp_only_in_short_months(self) -> None:
+        utc = ZoneInfo("UTC")
+        cases = [
+            # (run day, now, expected next run)
+            ((2026, 1, 31), (2026, 2, 10), (2026, 2, 28)),
+            ((2026, 1, 31), (2026, 3, 1), (2026, 3, 31)),
+            ((2026, 1, 31), (2026, 4, 5), (2026, 4, 30)),
+            ((2026, 1, 31), (2026, 5, 1), (2026, 5, 31)),
+            ((2026, 1, 30), (2026, 2, 10), (2026, 2, 28)),
+            ((2026, 1, 30), (2026, 3, 1), (2026, 3, 30)),
+            ((2026, 1, 30), (2026, 4, 5), (2026, 4, 30)),
+            ((2026, 1, 29), (2026, 2, 10), (2026, 2, 28)),
+            ((2026, 1, 29), (2026, 3, 1), (2026, 3, 29)),
+            ((2028, 1, 31), (2028, 2, 10), (2028, 2, 29)),
+            ((2028, 1, 30), (2028, 2, 10), (2028, 2, 29)),
+            ((2028, 1, 29), (2028, 2, 10), (2028, 2, 29)),
+            ((2028, 1, 31), (2028, 3, 1), (2028, 3, 31)),
+            ((2026, 3, 31), (2026, 4, 10), (2026, 4, 30)),
+            ((2026, 3, 31), (2026, 5, 1), (2026, 5, 31)),
+            ((2026, 5, 31), (2026, 6, 15), (2026, 6, 30)),
+            ((2026, 5, 31), (2026, 7, 1), (2026, 7, 31)),
+        ]
+        for run_day, now_day, expected_day in cases:
+            with self.subTest(run=run_day, now=now_day):
+                run_at = datetime(*run_day, 9, 0, tzinfo=utc)
+                now = datetime(*now_day, 12, 0, tzinfo=utc)
+                self.assertEqual(_monthly_next(run_at, now), datetime(*expected_day, 9, 0, tzinfo=utc))
+
+    def test_clamped_day_does_not_stick_across_many_months(self) -> None:
+        berlin = ZoneInfo("Europe/Berlin")
+        run_at = datetime(2025, 11, 30, 9, 0, tzinfo=berlin)
+        now = datetime(2026, 6, 30, 12, 0, tzinfo=berlin)
+        self.assertEqual(
+            _monthly_next(run_at, now, "Europe/Berlin"),
+            datetime(2026, 7, 30, 9, 0, tzinfo=berlin),
+        )
+
+    def test_future_run_at_is_returned_as_is(self) -> None:
+        utc = ZoneInfo("UTC")
+        run_at = datetime(2026, 1, 31, 9, 0, tzinfo=utc)
+        now = datetime(2026, 1, 15, 12, 0, tzinfo=utc)
+        self.assertEqual(_monthly_next(run_at, now), run_at)
+
+
+
+class TestParseUserDatetime(unittest.TestCase):
+    def test_accepts_date_time_with_optional_seconds(self) -> None:
+        utc = ZoneInfo("UTC")
+        self.assertEqual(
+            parse_user_datetime("2024-01-15 09:30", "UTC"), datetime(2024, 1, 15, 9, 30, tzinfo=utc)
+        )
+        self.assertEqual(
+            parse_user_datetime(" 2024-01-15 09:30:15 ", "Europe/Moscow"),
+            datetime(2024, 1, 15, 6, 30, 15, tzinfo=utc),
+        )
+        # Unpadded input still goes through the strptime fallback.
+        self.assertEqual(
+            parse_user_datetime("2024-1-5 9:30", "UTC"), datetime(2024, 1, 5, 9, 30, tzinfo=utc)
+        )
+
+    def test_rejects_iso_forms_outside_the_accepted_formats(self) -> None:
+        for value in (
+            "2024-W01-1 09:30",
+            "2024-W01-1 09:30:00",
+            "2024-01-15T09:30",
+            "2024-01-15 09:30+03",
+            "2024-01-15 0930",
+            "2024-01-15",
+        ):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    parse_user_datetime(value, "UTC")
+
+if __name__ == "__main__":
+    unittest.main()
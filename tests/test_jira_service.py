@@ -0,0 +1,88 @@
+import copy
+import dataclasses
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+
+import app.services.jira_service as jira_service
+from app.config.settings import settings
+
+
+class TestJiraSearchCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.calls: list[str] = []
+        self.now = 1000.0
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            jql = request.url.params["jql"]
+            self.calls.append(jql)
+            issues = [{"key": f"{jql}-{len(self.calls)}"}, {"key": f"{jql}-0"}]
+            return httpx.Response(200, json={"issues": issues})
+
+        jira_settings = dataclasses.replace(
+            settings, jira_email="bot@example.com", jira_api_token="t"
+        )
+        patches = [
+            mock.patch.object(jira_service, "settings", jira_settings),
+            mock.patch.object(jira_service, "time", SimpleNamespace(monotonic=lambda: self.now)),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+        self.jira = jira_service.JiraService()
+        await self.jira.aclose()
+        self.jira._client = httpx.AsyncClient(
+            base_url="https://jira.test", transport=httpx.MockTransport(handler)
+        )
+        self.addAsyncCleanup(self.jira.aclose)
+
+    async def test_hit_within_ttl_and_refetch_after_expiry(self) -> None:
+        first = await self.jira.search_issues("A", cache_ttl=30.0)
+        self.now += 29.0
+        second = await self.jira.search_issues("A", cache_ttl=30.0)
+        self.assertEqual(self.calls, ["A"])
+        self.assertEqual(second, first)
+
+        self.now += 1.0
+        third = await self.jira.search_issues("A", cache_ttl=30.0)
+        self.assertEqual(self.calls, ["A", "A"])
+        self.assertNotEqual(third, first)
+
+    async def test_without_cache_ttl_always_fetches(self) -> None:
+        await self.jira.search_issues("A")
+        await self.jira.search_issues("A")
+        self.assertEqual(self.calls, ["A", "A"])
+        self.assertEqual(len(self.jira._search_cache), 0)
+
+    async def test_mutating_results_does_not_change_the_cache(self) -> None:
+        first = await self.jira.search_issues("A", cache_ttl=30.0)
+        expected = copy.deepcopy(first)
+        first.sort(key=lambda issue: issue["key"])
+        first.append({"key": "X"})
+        first[0]["key"] = "CHANGED"
+
+        hit = await self.jira.search_issues("A", cache_ttl=30.0)
+        hit[0]["fields"] = {"summary": "changed"}
+        hit.clear()
+
+        self.assertEqual(await self.jira.search_issues("A", cache_ttl=30.0), expected)
+        self.assertEqual(self.calls, ["A"])
+
+    async def test_least_recently_used_entry_is_evicted(self) -> None:
+        with mock.patch.object(jira_service, "SEARCH_CACHE_MAX_SIZE", 2):
+            await self.jira.search_issues("A", cache_ttl=30.0)
+            await self.jira.search_issues("B", cache_ttl=30.0)
+            await self.jira.search_issues("A", cache_ttl=30.0)  # hit: A becomes most recent
+            await self.jira.search_issues("C", cache_ttl=30.0)  # evicts B
+
+            self.assertEqual(len(self.jira._search_cache), 2)
+            await self.jira.search_issues("A", cache_ttl=30.0)
+            await self.jira.search_issues("B", cache_ttl=30.0)
+        self.assertEqual(self.calls, ["A", "B", "C", "B"])
+
+
+if __name__ == "__main__":
+    unittest.main()